@@ -0,0 +1,143 @@
+"""
+GPU BVH traversal via numba.cuda.
+
+Once the BVH and the rays are plain SoA ndarrays, a one-ray-per-thread
+traversal kernel is a drop-in replacement for the CPU traverse -- each
+thread walks the tree with a small fixed-size stack in local memory, and
+the whole frame's rays go up to the device in one transfer.
+
+A CUDA kernel cannot call back into Python per leaf the way the CPU
+traversal does, so the leaf geometry has to be arrays too. This module
+handles the case where every bounded child of a Composite is a Sphere:
+each leaf is then fully described by its cached world-to-local transform
+(_M3, _Mt), and the in-kernel leaf test is the unit-sphere quadratic in
+local space. Composites holding other primitive types fall back to the
+CPU path.
+"""
+import numpy as np
+from numba import cuda
+
+
+def cudaAvailable()->bool:
+    """
+    True if there is a usable CUDA device to launch on.
+    """
+    try:
+        return cuda.is_available()
+    except Exception:
+        return False
+
+
+@cuda.jit
+def _trace_kernel(r0,v,aabb_min,aabb_max,left,right,leaf,M3,Mt,out_which,out_t):
+    """
+    One-ray-per-thread BVH traversal with unit-sphere leaves.
+
+    :param r0: (N,3) ray initial points
+    :param v: (N,3) ray directions
+    :param aabb_min: (M,3) node box minimum corners
+    :param aabb_max: (M,3) node box maximum corners
+    :param left: (M,) left child node indices, -1 for leaves
+    :param right: (M,) right child node indices, -1 for leaves
+    :param leaf: (M,) leaf (bounded-child) index for leaf nodes, -1 for inner
+    :param M3: (P,3,3) world-to-local rotation blocks, one per bounded child
+    :param Mt: (P,3) world-to-local translations, one per bounded child
+    :param out_which: (N,) output, leaf index of the nearest hit or -1
+    :param out_t: (N,) output, nearest positive t or inf
+    """
+    i=cuda.grid(1)
+    if i>=r0.shape[0]:
+        return
+    rx=r0[i,0];ry=r0[i,1];rz=r0[i,2]
+    vx=v[i,0];vy=v[i,1];vz=v[i,2]
+    ivx=1.0/vx if vx!=0.0 else np.inf
+    ivy=1.0/vy if vy!=0.0 else np.inf
+    ivz=1.0/vz if vz!=0.0 else np.inf
+    t_best=np.inf
+    which=-1
+    stack=cuda.local.array(64,np.int32)
+    stack[0]=0
+    top=1
+    while top>0:
+        top-=1
+        node=stack[top]
+        # Slab test against this node's box
+        ta=(aabb_min[node,0]-rx)*ivx
+        tb=(aabb_max[node,0]-rx)*ivx
+        tNear=min(ta,tb)
+        tFar=max(ta,tb)
+        ta=(aabb_min[node,1]-ry)*ivy
+        tb=(aabb_max[node,1]-ry)*ivy
+        tNear=max(tNear,min(ta,tb))
+        tFar=min(tFar,max(ta,tb))
+        ta=(aabb_min[node,2]-rz)*ivz
+        tb=(aabb_max[node,2]-rz)*ivz
+        tNear=max(tNear,min(ta,tb))
+        tFar=min(tFar,max(ta,tb))
+        if tFar<max(tNear,0.0) or tNear>=t_best:
+            continue
+        j=leaf[node]
+        if j<0:
+            stack[top]=left[node]
+            stack[top+1]=right[node]
+            top+=2
+            continue
+        # Leaf: unit-sphere quadratic in the child's local frame
+        lrx=M3[j,0,0]*rx+M3[j,0,1]*ry+M3[j,0,2]*rz+Mt[j,0]
+        lry=M3[j,1,0]*rx+M3[j,1,1]*ry+M3[j,1,2]*rz+Mt[j,1]
+        lrz=M3[j,2,0]*rx+M3[j,2,1]*ry+M3[j,2,2]*rz+Mt[j,2]
+        lvx=M3[j,0,0]*vx+M3[j,0,1]*vy+M3[j,0,2]*vz
+        lvy=M3[j,1,0]*vx+M3[j,1,1]*vy+M3[j,1,2]*vz
+        lvz=M3[j,2,0]*vx+M3[j,2,1]*vy+M3[j,2,2]*vz
+        a=lvx*lvx+lvy*lvy+lvz*lvz
+        b=2.0*(lrx*lvx+lry*lvy+lrz*lvz)
+        c=lrx*lrx+lry*lry+lrz*lrz-1.0
+        d=b*b-4.0*a*c
+        if d<0.0:
+            continue
+        sqrtd=d**0.5
+        t=(-b-sqrtd)/(2.0*a)
+        if t<=0.0:
+            t=(-b+sqrtd)/(2.0*a)
+        if t>0.0 and t<t_best:
+            t_best=t
+            which=j
+    out_which[i]=which
+    out_t[i]=t_best
+
+
+def traceSpheres(bvh,bounded,rays)->tuple:
+    """
+    Trace a batch of rays against a BVH whose bounded children are all
+    Spheres, on the GPU.
+
+    :param bvh: BVH built over the bounded children's world boxes
+    :param bounded: list of the bounded children, already prepared for render
+    :param rays: RayBatch in world space
+    :return: Tuple of (N,) int32 bounded-child index per ray (-1 for a miss)
+      and (N,) float32 nearest positive t per ray (inf for a miss)
+    """
+    P=len(bounded)
+    M3=np.empty((P,3,3),dtype=np.float32)
+    Mt=np.empty((P,3),dtype=np.float32)
+    for j,child in enumerate(bounded):
+        M3[j,:,:]=child._M3
+        Mt[j,:]=child._Mt
+    N=len(rays)
+    out_which=np.empty(N,dtype=np.int32)
+    out_t=np.empty(N,dtype=np.float32)
+    d_r0=cuda.to_device(rays.r0)
+    d_v=cuda.to_device(rays.v)
+    d_which=cuda.device_array(N,dtype=np.int32)
+    d_t=cuda.device_array(N,dtype=np.float32)
+    threads=128
+    blocks=(N+threads-1)//threads
+    _trace_kernel[blocks,threads](d_r0,d_v,
+                                  cuda.to_device(bvh.aabb_min),cuda.to_device(bvh.aabb_max),
+                                  cuda.to_device(bvh.left),cuda.to_device(bvh.right),
+                                  cuda.to_device(bvh.leaf),
+                                  cuda.to_device(M3),cuda.to_device(Mt),
+                                  d_which,d_t)
+    d_which.copy_to_host(out_which)
+    d_t.copy_to_host(out_t)
+    return out_which,out_t
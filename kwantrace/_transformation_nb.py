@@ -0,0 +1,201 @@
+"""
+Compiled kernels for transformation-matrix construction.
+
+The point-toward solution is a dozen tiny vector operations -- crosses,
+normalizes, a 3x3 product -- and at 3-element size each numpy call costs
+orders of magnitude more in dispatch than in arithmetic. Fusing the whole
+solution into one numba kernel does all of it on scalars in registers and
+allocates only the final 4x4.
+"""
+import numpy as np
+from numba import njit,prange
+
+
+# The explicit signature makes compilation happen eagerly at import rather
+# than lazily on the first call, and cache=True persists the compiled code on
+# disk -- so after the first run of a program, importing this module loads a
+# ready-made binary instead of invoking the JIT at all. That is the modern
+# replacement for numba's removed ahead-of-time (pycc) mode.
+@njit('f8[:,::1](f8,f8,f8,f8,f8,f8,f8,f8,f8,f8,f8,f8)',cache=True,fastmath=True)
+def point_toward(pbx,pby,pbz,prx,pry,prz,tbx,tby,tbz,trx,try_,trz):
+    """
+    Compute the point-toward matrix M_rb from the components of the four
+    constraint vectors. See kwantrace.transformation.calcPointToward() for
+    the derivation -- this is that math with the cross products, the
+    normalizations, and the R @ B^T product inlined.
+
+    :param pbx,pby,pbz: point vector in body frame
+    :param prx,pry,prz: point vector in world frame
+    :param tbx,tby,tbz: toward vector in body frame
+    :param trx,try_,trz: toward vector in world frame
+    :return: 4x4 matrix representing the rotation, with no translation
+    """
+    # Reference frame basis: p_r normalized, s_r = normalize(p_r x t_r),
+    # u_r = normalize(p_r x s_r)
+    srx=pry*trz-prz*try_
+    sry=prz*trx-prx*trz
+    srz=prx*try_-pry*trx
+    norm=1.0/(srx*srx+sry*sry+srz*srz)**0.5
+    srx*=norm;sry*=norm;srz*=norm
+    urx=pry*srz-prz*sry
+    ury=prz*srx-prx*srz
+    urz=prx*sry-pry*srx
+    norm=1.0/(urx*urx+ury*ury+urz*urz)**0.5
+    urx*=norm;ury*=norm;urz*=norm
+    norm=1.0/(prx*prx+pry*pry+prz*prz)**0.5
+    prx*=norm;pry*=norm;prz*=norm
+    # Body frame basis, same construction
+    sbx=pby*tbz-pbz*tby
+    sby=pbz*tbx-pbx*tbz
+    sbz=pbx*tby-pby*tbx
+    norm=1.0/(sbx*sbx+sby*sby+sbz*sbz)**0.5
+    sbx*=norm;sby*=norm;sbz*=norm
+    ubx=pby*sbz-pbz*sby
+    uby=pbz*sbx-pbx*sbz
+    ubz=pbx*sby-pby*sbx
+    norm=1.0/(ubx*ubx+uby*uby+ubz*ubz)**0.5
+    ubx*=norm;uby*=norm;ubz*=norm
+    norm=1.0/(pbx*pbx+pby*pby+pbz*pbz)**0.5
+    pbx*=norm;pby*=norm;pbz*=norm
+    # M_rb = R @ B^T with R=[p_r s_r u_r] and B=[p_b s_b u_b] as columns
+    M=np.zeros((4,4))
+    M[0,0]=prx*pbx+srx*sbx+urx*ubx
+    M[0,1]=prx*pby+srx*sby+urx*uby
+    M[0,2]=prx*pbz+srx*sbz+urx*ubz
+    M[1,0]=pry*pbx+sry*sbx+ury*ubx
+    M[1,1]=pry*pby+sry*sby+ury*uby
+    M[1,2]=pry*pbz+sry*sbz+ury*ubz
+    M[2,0]=prz*pbx+srz*sbx+urz*ubx
+    M[2,1]=prz*pby+srz*sby+urz*uby
+    M[2,2]=prz*pbz+srz*sbz+urz*ubz
+    M[3,3]=1.0
+    return M
+
+
+# No eager signature here: the stack's dtype follows the user-settable
+# transformation.MATRIX_DTYPE, so this compiles lazily once per dtype
+# actually used (and cache=True still persists each specialization).
+@njit(cache=True,fastmath=True)
+def reduce_combine(stack):
+    """
+    Reduce a (K,4,4) stack of transformation matrices to their product
+    stack[K-1] @ ... @ stack[1] @ stack[0] -- the combined matrix for
+    transformations applied in list order. The 4x4 multiplies are written
+    as explicit loops: at this size a library matmul call is all dispatch,
+    and here the whole chain runs without leaving the kernel or allocating
+    anything but the result and one scratch matrix.
+
+    :param stack: (K,4,4) C-contiguous stack of matrices, K >= 1
+    :return: 4x4 product. For K == 1, a copy of the single matrix.
+    """
+    result=stack[0].copy()
+    scratch=np.empty((4,4),dtype=stack.dtype)
+    for k in range(1,stack.shape[0]):
+        # Broadcast-FMA shape: each result row is a linear combination of
+        # the rows of the right operand, so the inner j loop is four
+        # independent lanes -- with fastmath on, LLVM turns each row into
+        # vector FMAs, the same pattern hand-written SSE/NEON 4x4 kernels
+        # use, without tying the source to an instruction set.
+        for i in range(4):
+            a0=stack[k,i,0];a1=stack[k,i,1];a2=stack[k,i,2];a3=stack[k,i,3]
+            for j in range(4):
+                scratch[i,j]=a0*result[0,j]+a1*result[1,j] \
+                            +a2*result[2,j]+a3*result[3,j]
+        result[:,:]=scratch
+    return result
+
+
+# Lazy signature for the same MATRIX_DTYPE reason as reduce_combine above
+@njit(cache=True,fastmath=True)
+def combine_invert(stack,M_rb,M_br,N_rb,rigid):
+    """
+    Produce all three matrices prepareRender needs in one compiled pass:
+    reduce the (K,4,4) chain into M_rb, invert it in closed affine form into
+    M_br (cofactor inverse of the 3x3 linear block and -Rinv t for the
+    translation -- bottom row [0,0,0,1] assumed), and materialize the normal
+    matrix N_rb as the contiguous transpose of M_br. One call, every
+    intermediate in registers, three caller-owned outputs filled with no
+    allocation at all.
+
+    :param stack: (K,4,4) C-contiguous stack of matrices, K >= 1
+    :param M_rb: 4x4 output, the combined body-to-reference matrix
+    :param M_br: 4x4 output, its inverse
+    :param N_rb: 4x4 output, the transpose of M_br
+    :param rigid: True if every matrix in the stack is rigid (rotation and/or
+      translation only, per Transformation.isRigid). The linear block is then
+      orthonormal and its inverse is just its transpose -- no cofactors, no
+      determinant, no division.
+    """
+    M_rb[:,:]=stack[0]
+    scratch=np.empty((4,4),dtype=stack.dtype)
+    for k in range(1,stack.shape[0]):
+        # Broadcast-FMA shape, see reduce_combine for why
+        for i in range(4):
+            a0=stack[k,i,0];a1=stack[k,i,1];a2=stack[k,i,2];a3=stack[k,i,3]
+            for j in range(4):
+                scratch[i,j]=a0*M_rb[0,j]+a1*M_rb[1,j] \
+                            +a2*M_rb[2,j]+a3*M_rb[3,j]
+        M_rb[:,:]=scratch
+    m00=M_rb[0,0];m01=M_rb[0,1];m02=M_rb[0,2];t0=M_rb[0,3]
+    m10=M_rb[1,0];m11=M_rb[1,1];m12=M_rb[1,2];t1=M_rb[1,3]
+    m20=M_rb[2,0];m21=M_rb[2,1];m22=M_rb[2,2];t2=M_rb[2,3]
+    if rigid:
+        M_br[0,0]=m00;M_br[0,1]=m10;M_br[0,2]=m20
+        M_br[1,0]=m01;M_br[1,1]=m11;M_br[1,2]=m21
+        M_br[2,0]=m02;M_br[2,1]=m12;M_br[2,2]=m22
+    else:
+        c00=m11*m22-m12*m21
+        c10=m12*m20-m10*m22
+        c20=m10*m21-m11*m20
+        d=1.0/(m00*c00+m01*c10+m02*c20)
+        M_br[0,0]=c00*d
+        M_br[0,1]=(m02*m21-m01*m22)*d
+        M_br[0,2]=(m01*m12-m02*m11)*d
+        M_br[1,0]=c10*d
+        M_br[1,1]=(m00*m22-m02*m20)*d
+        M_br[1,2]=(m02*m10-m00*m12)*d
+        M_br[2,0]=c20*d
+        M_br[2,1]=(m01*m20-m00*m21)*d
+        M_br[2,2]=(m00*m11-m01*m10)*d
+    M_br[0,3]=-(M_br[0,0]*t0+M_br[0,1]*t1+M_br[0,2]*t2)
+    M_br[1,3]=-(M_br[1,0]*t0+M_br[1,1]*t1+M_br[1,2]*t2)
+    M_br[2,3]=-(M_br[2,0]*t0+M_br[2,1]*t1+M_br[2,2]*t2)
+    M_br[3,0]=0.0;M_br[3,1]=0.0;M_br[3,2]=0.0;M_br[3,3]=1.0
+    for i in range(4):
+        for j in range(4):
+            N_rb[i,j]=M_br[j,i]
+
+
+@njit('void(f8[:,::1],f8[:,::1],f8[:,::1],f8[:,:,::1])',
+      cache=True,fastmath=True,parallel=True)
+def trs_batch(translate,rotate,scale,out):
+    """
+    Fill a stack of 4x4 translate-rotate-scale matrices, one per row of the
+    inputs. Each matrix is the closed form used by Transformation subclass
+    TRS: upper-left block is Rz @ Ry @ Rx with its columns scaled, last
+    column is the translation. Rows are independent, so the loop is a
+    prange and numba spreads it over threads.
+
+    :param translate: (N,3) translations
+    :param rotate: (N,3) rotation angles around x, y, z, in radians
+    :param scale: (N,3) per-axis scale factors
+    :param out: (N,4,4) output stack of matrices
+    """
+    for i in prange(translate.shape[0]):
+        cx=np.cos(rotate[i,0]);sx=np.sin(rotate[i,0])
+        cy=np.cos(rotate[i,1]);sy=np.sin(rotate[i,1])
+        cz=np.cos(rotate[i,2]);sz=np.sin(rotate[i,2])
+        kx=scale[i,0];ky=scale[i,1];kz=scale[i,2]
+        out[i,0,0]=kx*(cz*cy)
+        out[i,0,1]=ky*(cz*sy*sx-sz*cx)
+        out[i,0,2]=kz*(cz*sy*cx+sz*sx)
+        out[i,0,3]=translate[i,0]
+        out[i,1,0]=kx*(sz*cy)
+        out[i,1,1]=ky*(sz*sy*sx+cz*cx)
+        out[i,1,2]=kz*(sz*sy*cx-cz*sx)
+        out[i,1,3]=translate[i,1]
+        out[i,2,0]=kx*(-sy)
+        out[i,2,1]=ky*(cy*sx)
+        out[i,2,2]=kz*(cy*cx)
+        out[i,2,3]=translate[i,2]
+        out[i,3,0]=0.0;out[i,3,1]=0.0;out[i,3,2]=0.0;out[i,3,3]=1.0
@@ -1,7 +1,23 @@
+import numpy as np
+
 from kwantrace.position_direction import Position
 from kwantrace.transformable import Transformable
 
 
+def ObjectColor(r:float,g:float,b:float,f:float=0.0,t:float=0.0):
+    """
+    Return an object color vector -- red, green, blue, filter, transmit, as in POV-Ray.
+
+    :param r: red component
+    :param g: green component
+    :param b: blue component
+    :param f: filter component
+    :param t: transmit component
+    :return: 5-element float32 vector
+    """
+    return np.array([r,g,b,f,t],dtype=np.float32)
+
+
 class Field(Transformable):
     """
     A field -- a function which takes a vector and returns a vector
@@ -11,6 +27,7 @@ class Field(Transformable):
 
         :param N: Number of components of the vector result
         """
+        super().__init__()
         self.N=N
     def _fieldLocal(self,r:Position):
         """
@@ -20,14 +37,70 @@ class Field(Transformable):
         :return: Value of the field at this point
         """
         raise NotImplementedError("Abstract")
-    def __call__(self,r:Position):
+    def _evalWorld(self,r:Position,rLocal:Position=None):
+        """
+        Evaluate the field at a point in world space, through the full
+        world-to-local transformation.
+
+        :param r: Position to evaluate the field at -- either a single (4,1)
+          column or a batch of (N,3) rows, as the shading path hands out
+        :param rLocal: Optional already-transformed position in local space. A caller
+          which has already computed `M_br @ r` (the shading path does, for the
+          normal and inside checks) can pass it in to skip redoing the same matvec.
+        :return: value of the field at this point
+        """
+        if rLocal is None:
+            if r.ndim==2 and r.shape[1]==3:
+                # (N,3) row batch: same transform through the cached float32
+                # blocks, transposed to act on rows
+                rLocal=r @ self._M3.T + self._Mt
+            else:
+                rLocal=self.M_br @ r
+        return self._fieldLocal(rLocal)
+    def _evalIdentity(self,r:Position,rLocal:Position=None):
+        """
+        Evaluate the field at a point when M_br is the identity -- world space
+        *is* local space, so evaluate at the world point and skip the matvec.
+
+        :param r: Position to evaluate the field at
+        :param rLocal: used only when no world point is given. A passed
+          rLocal is the *caller's* local point, which is only this field's
+          local point when the caller shares this field's transform -- and
+          with an identity M_br the world point is already correct, so when
+          both are supplied the world point wins.
+        :return: value of the field at this point
+        """
+        return self._fieldLocal(r if r is not None else rLocal)
+    # Rebound on the instance by prepareRender() -- most pigments carry no
+    # transformation at all, and for those the per-sample M_br matvec is pure
+    # overhead. Same runtime-specialization trick as Primitive.normal().
+    _evalField=_evalWorld
+    def __call__(self,r:Position,rLocal:Position=None):
         """
         Evaluate the function at a point in world space.
 
         :param r: Position to evaluate the field at
+        :param rLocal: Optional already-transformed position in local space
         :return: value of the field at this point
         """
-        return self.fieldLocal(self.M_br @ r)
+        return self._evalField(r,rLocal)
+    def prepareRender(self):
+        """
+        Prepare the field for rendering.
+
+        On top of building the matrices, pick the evaluation path: if the
+        world-to-local matrix came out as the identity, bind the version of
+        the evaluator that never touches it. Otherwise cache the float32
+        blocks of M_br (same layout Renderable.prepareRender caches) so the
+        batched evaluator can transform (N,3) rows without slicing per call.
+        """
+        super().prepareRender()
+        if np.array_equal(self.M_br,np.identity(4)):
+            self._evalField=self._evalIdentity
+        else:
+            self._M3=np.ascontiguousarray(self.M_br[0:3,0:3],dtype=np.float32)
+            self._Mt=np.ascontiguousarray(self.M_br[0:3,3],dtype=np.float32)
+            self._evalField=self._evalWorld
 
 
 class ColorField(Field):
@@ -35,15 +108,52 @@ class ColorField(Field):
         super().__init__(5)
 
 
+class _NullPigment(ColorField):
+    """
+    The pigment an object has when it has no pigment.
+
+    Evaluating it yields None (the same answer evalPigment() used to compute
+    for pigmentless objects), and appending transformations or preparing it
+    for render are no-ops. Having every Renderable hold this singleton instead
+    of None makes the pigment codepaths branchless -- no `is not None` test
+    and attribute load on the per-sample shading path, and no Optional typing
+    anywhere a compiled kernel might want to see the pigment.
+
+    Use the _NULL_PIGMENT module-level singleton rather than constructing one.
+    """
+    def __call__(self,r:Position,rLocal:Position=None):
+        return None
+    def append(self,transform):
+        pass
+    def prepareRender(self):
+        pass
+
+
+_NULL_PIGMENT=_NullPigment()
+
+
 class ConstantColor(ColorField):
     """
-    Constant color field -- has constant color everywhere in space */
+    Constant color field -- has constant color everywhere in space
     """
-    def __init__(self,Lvalue:ObjectColor):
+    def __init__(self,Lvalue:np.ndarray):
         """
 
-        :param Lvalue: Value of field at all points
+        :param Lvalue: Value of field at all points, as from ObjectColor()
         """
-        self._value=Lvalue
+        super().__init__()
+        self._value=np.asarray(Lvalue,dtype=np.float32).ravel()
     def _fieldLocal(self,r:Position):
+        """
+        Return the constant value, batched to match the input.
+
+        For a batch of positions ((N,3) rows, as in RayBatch), this returns a
+        broadcast view of shape (N,5) -- no allocation, no compute, one Python
+        call for the whole batch. A single (4,1) position gets the plain value.
+
+        :param r: Position(s) to evaluate the field at, in local space
+        :return: Value of the field, (N,5) view for a batch or (5,) for a point
+        """
+        if r.ndim==2 and r.shape[1]!=1:
+            return np.broadcast_to(self._value,(r.shape[0],self.N))
         return self._value
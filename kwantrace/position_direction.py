@@ -111,6 +111,13 @@ that uses any value of \f$w\f$, but so far I haven't found any use but 0 and 1.
 """
 import numpy as np
 
+# Working dtype for the per-pixel data -- positions, directions, and colors.
+# The render path is memory-bound, so float32 halves the bytes it moves and
+# doubles the SIMD lane count relative to float64, at precision that is fine
+# for visualization output. Transformation matrices are still built in
+# float64 and the render-ready float32 pieces are cached in prepareRender().
+DEFAULT_DTYPE=np.float32
+
 
 def Position(x:float,y:float,z:float):
     """
@@ -118,13 +125,13 @@ def Position(x:float,y:float,z:float):
 
     A position vector is a vector that participates in translation. This is represented
     as a 4-element vector with 1.0 in the `w` slot.
-    
+
     :param x: x component
     :param y: y component
     :param z: z component
     :return: 4-element column vector with 1 as w component
     """
-    return np.array([[x],[y],[z],[1.0]])
+    return np.array([[x],[y],[z],[1.0]],dtype=DEFAULT_DTYPE)
 
 
 def Direction(x: float, y: float, z: float):
@@ -139,7 +146,40 @@ def Direction(x: float, y: float, z: float):
     :param z: z component
     :return: 4-element column vector with 0 as w component
     """
-    return np.array([[x], [y], [z], [0.0]])
+    return np.array([[x], [y], [z], [0.0]], dtype=DEFAULT_DTYPE)
+
+
+def PositionArray(xs,ys,zs):
+    """
+    Return a batch of Position vectors, one per row.
+
+    One call allocates the whole batch, where building N scalar Positions
+    would be N tiny allocations through the interpreter. The row layout means
+    a whole batch transforms with a single `pts @ M.T` rather than N
+    matrix-vector products.
+
+    :param xs: x components, any array-like of N values
+    :param ys: y components
+    :param zs: z components
+    :return: (N,4) C-contiguous array with 1 in each w slot
+    """
+    xs=np.asarray(xs,dtype=DEFAULT_DTYPE)
+    return np.stack([xs,np.asarray(ys,dtype=DEFAULT_DTYPE),
+                     np.asarray(zs,dtype=DEFAULT_DTYPE),np.ones_like(xs)],axis=1)
+
+
+def DirectionArray(xs,ys,zs):
+    """
+    Return a batch of Direction vectors, one per row.
+
+    :param xs: x components, any array-like of N values
+    :param ys: y components
+    :param zs: z components
+    :return: (N,4) C-contiguous array with 0 in each w slot
+    """
+    xs=np.asarray(xs,dtype=DEFAULT_DTYPE)
+    return np.stack([xs,np.asarray(ys,dtype=DEFAULT_DTYPE),
+                     np.asarray(zs,dtype=DEFAULT_DTYPE),np.zeros_like(xs)],axis=1)
 
 
 def col_vector(x: float, y: float, z: float):
@@ -1,10 +1,141 @@
-from position_direction import Position, Direction
 from __future__ import annotations
 
+import numpy as np
+
+from kwantrace._ray_nb import ray_eval, ray_advance, ray_transform, ray_transform_batch
+from kwantrace.position_direction import Position, Direction
+
+
+class RayBatch:
+    r"""
+    A batch of mathematical rays, stored struct-of-arrays style.
+
+    Each ray starts at an initial point \f$\vec{r}_0\f$ and continues in direction
+    \f$\vec{v}\f$, so it can be used as a vector function of a single parameter
+    \f$\vec{r}(t)=\vec{r}_0+\vec{v}t\f$. Rather than holding one (r0,v) pair per
+    Python object, a RayBatch holds N rays in two (N,3) arrays. The render inner
+    loop works on millions of rays, so anything done per-ray in Python dominates
+    the frame time -- by batching, one matrix transformation of the whole batch
+    is a single BLAS call instead of N Python operator dispatches.
+
+    The direction vectors do not have to be unit length, but if they are, then the
+    \f$t\f$ parameter just represents the distance along each ray.
+
+    The components are stored as C-contiguous float32, which halves memory
+    bandwidth relative to float64 and keeps the arrays in the form that BLAS
+    and any downstream compiled kernels like best.
+    """
+    # Tell numpy to keep its hands off `M @ rays` -- without this, ndarray.__matmul__
+    # tries to coerce the batch itself instead of deferring to our __rmatmul__.
+    __array_ufunc__ = None
+    def __init__(self,Lr0:np.ndarray,Lv:np.ndarray):
+        """
+        Construct a batch of rays from the given initial positions and directions.
+
+        :param Lr0: (N,3) array of ray initial points
+        :param Lv: (N,3) array of ray directions
+        """
+        self.r0=np.ascontiguousarray(Lr0,dtype=np.float32)
+        self.v=np.ascontiguousarray(Lv,dtype=np.float32)
+    @classmethod
+    def fromContiguous(cls,Lr0:np.ndarray,Lv:np.ndarray)->RayBatch:
+        """
+        Wrap arrays that are already C-contiguous float32 without re-checking them.
+
+        The per-primitive intersect path constructs its local-space batch from
+        freshly allocated buffers, so the layout checks in __init__ are pure
+        overhead there.
+
+        :param Lr0: (N,3) C-contiguous float32 array of ray initial points
+        :param Lv: (N,3) C-contiguous float32 array of ray directions
+        """
+        batch=cls.__new__(cls)
+        batch.r0=Lr0
+        batch.v=Lv
+        return batch
+    def __len__(self):
+        """
+        Number of rays in the batch.
+        """
+        return self.r0.shape[0]
+    def packets(self,stride:int=8):
+        """
+        Iterate over the batch in packets of consecutive rays.
+
+        Primary rays are generated in image order, so consecutive rays are
+        spatially coherent -- a packet of neighbors tends to enter the same
+        BVH subtrees, letting a traversal maintain one small active mask per
+        packet and skip a subtree the moment every ray in the packet misses
+        its box. The packets are zero-copy views of this batch's arrays.
+
+        :param stride: rays per packet; the last packet may be shorter
+        :return: generator of (offset, RayBatch) pairs, where offset is the
+          index of the packet's first ray within this batch
+        """
+        for start in range(0,len(self),stride):
+            yield start,RayBatch.fromContiguous(self.r0[start:start+stride,:],
+                                                self.v[start:start+stride,:])
+    def __rmatmul__(self,M:np.ndarray)->RayBatch:
+        """
+        Transform this batch of rays with a 4x4 homogeneous matrix.
+
+        The positions and directions have to be handled differently, since an
+        initial point is a position which participates in translation, while a
+        direction does not. Rather than building (N,4) homogeneous vectors, we
+        multiply by the upper-left 3x3 block and add the translation column only
+        to the positions -- the same arithmetic, without materializing the w
+        components. The multiply itself runs in the compiled
+        ray_transform_batch kernel, which keeps the matrix in registers and
+        vectorizes across rays.
+
+        :param M: 4x4 transformation matrix
+        :return: New RayBatch with all rays transformed
+        """
+        M3=np.ascontiguousarray(M[0:3,0:3],dtype=np.float32)
+        Mt=np.ascontiguousarray(M[0:3,3],dtype=np.float32)
+        new_r0=np.empty_like(self.r0)
+        new_v=np.empty_like(self.v)
+        ray_transform_batch(M3,Mt,self.r0,self.v,new_r0,new_v)
+        return RayBatch(new_r0,new_v)
+    def __call__(self,t:np.ndarray)->np.ndarray:
+        """
+        Evaluate all rays in the batch.
+
+        :param t: (N,) array of parameters, one per ray
+        :return: (N,3) array of points, one on each ray at its given parameter
+        """
+        return self.r0+self.v*np.asarray(t,dtype=self.v.dtype).reshape(-1,1)
+    def evalInto(self,t:np.ndarray,out:np.ndarray)->np.ndarray:
+        """
+        Evaluate all rays in the batch into a pre-allocated buffer.
+
+        Same result as __call__, but writes into `out` instead of allocating --
+        a renderer evaluating bounce after bounce can keep a scratch buffer per
+        tile instead of producing a fresh array per bounce.
+
+        :param t: (N,) array of parameters, one per ray
+        :param out: (N,3) buffer to write the points into
+        :return: out
+        """
+        np.multiply(self.v,np.asarray(t,dtype=self.v.dtype).reshape(-1,1),out=out)
+        np.add(out,self.r0,out=out)
+        return out
+    def __add__(self,dt)->RayBatch:
+        """
+        Advance each ray in the batch by a given amount.
+
+        :param dt: scalar or (N,) array, amount to advance the parameter
+        :return: A copy of the batch with each ray's initial point advanced,
+          so `(batch+dt)(t)` equals `batch(t+dt)` ray by ray.
+        """
+        return RayBatch(self(np.broadcast_to(dt,(len(self),))),self.v)
+    def __radd__(self,dt)->RayBatch:
+        return self+dt
+
 
 class Ray:
     r"""
-    A mathematical ray, starting at an initial point \f$\vec{r}_0\f$ and continuing in direction
+    A single mathematical ray, starting at an initial point \f$\vec{r}_0\f$ and continuing in direction
     \f$\vec{v}\f$. This can be used as a vector function of a single parameter \f$\vec{r}(t)=\vec{r}_0+\vec{v}t\f$.
 
     The direction vector does not have to be unit length, but if it is unit length, then the \f$t\f$
@@ -14,23 +145,32 @@ class Ray:
     no matter what the parameter was. This class will work perfectly fine, but most likely
     all intersect functions will be asked to divide by zero at some point.
 
-    This class is mostly a container for the vector coefficients, which are directly used by the intersection
-    routines in kwantrace::Primitive.intersect() . Those routines are responsible for determining if a given
-    ray actually hits anything.
+    This class is a thin scalar wrapper around the same math that RayBatch does
+    N at a time -- the intersection routines in kwantrace::Primitive.intersect()
+    work on batches, so this is mostly a convenience for construction and tests.
 
     The ray does support a couple of operators, to handle evaluating the ray at a given parameter,
     transforming with a matrix, and advancing the ray (generating a new ray which starts at a given parameter
     from the old ray).
     """
+    # As in RayBatch, make ndarray.__matmul__ defer `M @ ray` to our __rmatmul__.
+    __array_ufunc__ = None
     def __init__(self,Lr0:Position,Lv:Direction):
         """
-        Construct an array from the given initial position and direction.
+        Construct a ray from the given initial position and direction.
 
         :param Lr0: Ray initial point
         :param Lv: Ray direction
         """
         self.r0=Lr0
         self.v=Lv
+    def batch(self)->RayBatch:
+        """
+        Convert this single ray into a one-ray RayBatch.
+
+        :return: RayBatch of length 1 holding this ray
+        """
+        return RayBatch(self.r0[0:3].reshape(1,3),self.v[0:3].reshape(1,3))
     def __rmatmul__(self,M):
         """
         Transform this ray with a matrix.
@@ -42,15 +182,20 @@ class Ray:
         :param M:
         :return:
         """
-        return Ray(M @ self.R0, M @ self.v)
+        new_r0=np.empty_like(self.r0)
+        new_v=np.empty_like(self.v)
+        ray_transform(np.ascontiguousarray(M),self.r0.ravel(),self.v.ravel(),
+                      new_r0.ravel(),new_v.ravel())
+        return Ray(new_r0,new_v)
     def __iadd__(self,dt:float):
         """
         Advance this ray a certain amount
 
         :param dt: Amount to advance the ray
-        :return: None, but ray has its initial point advanced, so ray(t)==oldray(t+dt)
+        :return: This ray, with its initial point advanced, so ray(t)==oldray(t+dt)
         """
-        self.r0+=self.v*dt
+        ray_advance(self.r0.ravel(),self.v.ravel(),dt,self.r0.ravel())
+        return self
     def __call__(self,t:float)->Position:
         """
         Evaluate the ray.
@@ -58,7 +203,38 @@ class Ray:
         :param t: Parameter to evaluate the ray at
         :return: Point on ray at given parameter
         """
-        return self.r0+self.v*t
+        out=np.empty_like(self.r0)
+        ray_eval(self.r0.ravel(),self.v.ravel(),t,out.ravel())
+        return out
+    def evalInto(self,t:float,out:np.ndarray)->np.ndarray:
+        """
+        Evaluate the ray into a pre-allocated buffer.
+
+        Same result as __call__, but writes into `out` instead of allocating a
+        fresh vector. In tight recursion (reflection/refraction bounces) the
+        per-call allocations are the dominant cost, so the renderer keeps a
+        pool of scratch vectors and evaluates into those.
+
+        :param t: Parameter to evaluate the ray at
+        :param out: (4,1) buffer to write the point into
+        :return: out
+        """
+        ray_eval(self.r0.ravel(),self.v.ravel(),t,out.ravel())
+        return out
+    def advanceInto(self,dt:float,out_ray:Ray)->Ray:
+        """
+        Advance the ray into a pre-allocated Ray.
+
+        Same result as __add__, but writes into out_ray's vectors instead of
+        allocating a new Ray and initial point.
+
+        :param dt: amount to advance the parameter
+        :param out_ray: Ray whose vectors are overwritten with the result
+        :return: out_ray
+        """
+        ray_advance(self.r0.ravel(),self.v.ravel(),dt,out_ray.r0.ravel())
+        out_ray.v[:]=self.v
+        return out_ray
     def __add__(self,dt:float)->Ray:
         """
         Advance a ray by a given amount.
@@ -69,7 +245,8 @@ class Ray:
 
         Given `rp=r+4.7` the expression `np.allclose(rp(t),r(t+4.7))` will be true
         """
-        return Ray(self.r0+self.v*dt,self.v)
+        new_r0=np.empty_like(self.r0)
+        ray_advance(self.r0.ravel(),self.v.ravel(),dt,new_r0.ravel())
+        return Ray(new_r0,self.v)
     def __radd__(self,dt:float):
-        return Ray(self.r0 + self.v * dt, self.v)
-
+        return self+dt
@@ -0,0 +1,91 @@
+"""
+The frame loop -- turn a batch of primary rays and a scene into colors.
+
+Rendering a frame is embarrassingly parallel: every pixel's ray is traced
+and shaded independently. The loop here is organized around that fact. The
+frame's rays are processed in fixed-size tiles, each tile is traced through
+the scene's BVH in coherent packets, and shading is done one batch per
+primitive rather than one call per pixel, so the constant-pigment common
+case is a single broadcast. Tiles share nothing but the output buffer
+(disjoint slices of it), so they can be dispatched to a thread pool, where
+the array-heavy work inside numpy and the compiled kernels runs outside
+the interpreter.
+"""
+import concurrent.futures
+
+import numpy as np
+
+from kwantrace.ray import RayBatch
+from kwantrace.renderable import Renderable
+
+
+def _renderTile(scene:Renderable,rays:RayBatch,out:np.ndarray,packet_stride:int):
+    """
+    Trace and shade one tile of rays, writing colors into the given slice of
+    the frame's output buffer.
+
+    :param scene: Renderable to trace against, already prepared for rendering
+    :param rays: RayBatch holding this tile's rays
+    :param out: (N,5) float32 slice of the output buffer for this tile
+    :param packet_stride: rays per BVH traversal packet, see Composite.trace()
+    """
+    prims,t=scene.trace(rays,packet_stride)
+    # Shade per distinct primitive, so each pigment is evaluated as one batch.
+    # Distinctness is by identity -- primitives are sequence-like
+    # (Transformable defines __len__/__getitem__), so don't hand them to
+    # anything that might treat them as arrays.
+    for prim in {id(p):p for p in prims[prims!=None]}.values():
+        # Identity comparison element by element -- `prims==prim` would let
+        # numpy broadcast the primitive as a sequence again
+        sel=np.fromiter((p is prim for p in prims),dtype=bool,count=len(prims))
+        sub=RayBatch(rays.r0[sel,:],rays.v[sel,:])
+        tF=np.empty(len(sub),dtype=np.float32)
+        nF=np.empty((len(sub),3),dtype=np.float32)
+        cF=np.empty((len(sub),5),dtype=np.float32)
+        if prim.traceFused(sub,tF,nF,cF):
+            # One kernel pass produced t, normal, and color for every ray that
+            # chose this primitive -- no staged intermediates
+            out[sel,:]=cF
+            continue
+        # Hit points only for the rays that chose this primitive -- their t
+        # values are all finite, so no inf*0 warnings from the misses
+        r=sub(t[sel])
+        rLocal=r @ prim._M3.T + prim._Mt
+        color=prim.evalPigment(r,rLocal)
+        if color is not None:
+            out[sel,:]=color
+
+
+def renderFrame(scene:Renderable,rays:RayBatch,tile:int=256,packet_stride:int=8,
+                nthreads:int=None)->np.ndarray:
+    """
+    Render a frame: trace every ray in the batch against the scene and return
+    the color each one sees.
+
+    :param scene: Renderable to trace against. prepareRender() must already
+      have been called on it.
+    :param rays: RayBatch of primary rays, in world space, in image order
+    :param tile: rays per tile. Each tile's working set (rays, hit records,
+      colors) is sized to stay cache-resident, and tiles are the unit of
+      parallel dispatch.
+    :param packet_stride: rays per BVH traversal packet within a tile
+    :param nthreads: number of worker threads, or None to render tiles
+      serially on the calling thread
+    :return: (N,5) float32 array of colors, one per ray. Rays that hit
+      nothing, or hit something with no pigment anywhere in its ancestry,
+      are left black (all zeros).
+    """
+    N=len(rays)
+    out=np.zeros((N,5),dtype=np.float32)
+    tiles=[(tileRays,out[start:start+len(tileRays),:])
+           for start,tileRays in rays.packets(tile)]
+    if nthreads is None:
+        for tileRays,tileOut in tiles:
+            _renderTile(scene,tileRays,tileOut,packet_stride)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=nthreads) as pool:
+            futures=[pool.submit(_renderTile,scene,tileRays,tileOut,packet_stride)
+                     for tileRays,tileOut in tiles]
+            for future in futures:
+                future.result()
+    return out
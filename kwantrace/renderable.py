@@ -1,8 +1,12 @@
-from kwanmath.vector import vnormalize
+import functools
 
-from kwantrace.field import ColorField
+import numpy as np
+
+from kwantrace.field import ColorField, ConstantColor, _NULL_PIGMENT
+from kwantrace._ray_nb import ray_transform_batch
+from kwantrace.bvh import BVH
 from kwantrace.position_direction import Position, Direction
-from kwantrace.ray import Ray
+from kwantrace.ray import Ray, RayBatch
 from kwantrace.transformable import Transformable
 from kwantrace.transformation import Transformation
 
@@ -14,6 +18,15 @@ class Renderable(Transformable):
      This is able to be intersected and has an inside, but does not have a normal.
      It has a pigment since it is needed both for Primitive, and for Composite as the default pigment.
     """
+    def __init__(self):
+        super().__init__()
+        self.pigment=_NULL_PIGMENT
+        self.parent=None
+        # Effective pigment after walking the parent chain, resolved in prepareRender()
+        self._effective_pigment=_NULL_PIGMENT
+        # Whether the primitive's local point doubles as the pigment's, also
+        # resolved in prepareRender()
+        self._pigment_local_ok=False
     def setParent(self,Lparent):
         """
         Set a pointer to the parent object.
@@ -23,24 +36,42 @@ class Renderable(Transformable):
         Intended to be used by the prepareRender() of container Renderable objects.
         """
         self.parent=Lparent # Used to find parent object to inherit default properties from
-    def intersect(self,ray:Ray):
+    def intersect(self,rays:RayBatch):
         """
-        Intersect a ray with this Renderable, in world space.
+        Intersect a batch of rays with this Renderable, in world space.
 
-        :param ray: Ray in world space
-        :return: tuple[Primitive],float
-        First is the primitive that is intersected, or None if none are. Second is t ray
-        parameter if intersection occurs, unspecified if not.
+        :param rays: RayBatch in world space
+        :return: tuple[np.ndarray,np.ndarray]
+        First is an (N,) boolean hit mask, true for each ray that intersects. Second is the
+        (N,) array of t ray parameters at intersection, unspecified wherever the mask is false.
 
-        Note that this always a Primitive. This is able to see down through an arbitrarily
-        large tree of Composite Renderables to pick out the actual visible surface geometry.
+        This is able to see down through an arbitrarily large tree of Composite
+        Renderables to pick out the actual visible surface geometry.
+        """
+        raise NotImplementedError("Abstract method")
+    def trace(self,rays:RayBatch,packet_stride:int=8):
+        """
+        Find the nearest visible surface for each ray in a batch, in world space.
+
+        :param rays: RayBatch in world space
+        :param packet_stride: rays per traversal packet, for implementations
+          that walk an acceleration structure; others may ignore it
+        :return: tuple[np.ndarray,np.ndarray]
+        First is an (N,) object array holding the Primitive each ray hits, or None
+        for a miss. Second is the (N,) float32 array of nearest positive t
+        parameters, infinity for a miss.
+
+        Unlike intersect(), this keeps track of *which* primitive is the nearest
+        hit, which the shading code needs.
         """
         raise NotImplementedError("Abstract method")
-    def inside(self,r:Position)->bool:
+    def inside(self,r:Position,rLocal:Position=None)->bool:
         """
         Determine if the given point is inside the Renderable.
 
         :param r: Point to check for insideness
+        :param rLocal: Optional already-transformed point in local space, see
+          Primitive.normal() for the convention.
         :return: True if point is inside, false if not.
         """
         raise NotImplementedError("Abstract method")
@@ -51,22 +82,29 @@ class Renderable(Transformable):
         :param Lpigment: Pigment to use. If None is passed, the existing pigment is removed
         and the Renderable is treated as having no pigment.
         """
-        self.pigment = Lpigment
-    def evalPigment(self,r:Position):
+        self.pigment = Lpigment if Lpigment is not None else _NULL_PIGMENT
+    def evalPigment(self,r:Position,rLocal:Position=None):
         """
-    / ** Evaluate the intrinsic color of this object at a point
+        Evaluate the intrinsic color of this object at a point
 
         :param r: Position to evaluate the color at
-        :return: Tuple of:
-          * True if color is evaluated, false if not
-          * Color at this point, if any. Unspecified if function returns false.
-        """
-        if self.pigment is not None:
-            return self.pigment(r)
-        elif self.parent is not None:
-            return self.parent.evalPigment(r)
-        else:
-            return None
+        :param rLocal: Optional already-transformed position in local space, passed
+          through to the pigment so the shading path only does the world-to-local
+          matvec once per hit.
+        :return: Color at this point, or None if neither this object nor any
+          ancestor has a pigment.
+
+        The parent chain was already walked once in prepareRender(), so this is a
+        single attribute access and one call rather than a recursion up the tree
+        for every shading sample.
+        """
+        if self._pigment_local_ok:
+            return self._effective_pigment(r,rLocal)
+        # The pigment's local frame is not this object's -- it is inherited
+        # from an ancestor, or it carried transforms of its own before this
+        # object's were appended -- so our local point means nothing to it.
+        # Let it do its own world-to-local transform.
+        return self._effective_pigment(r)
     def append(self,transform:Transformation):
         """
         Add a transformation to this Renderable.
@@ -76,8 +114,7 @@ class Renderable(Transformable):
         Also adds the transformation to the Renderable object's pigment, if any
         """
         super().append(transform)
-        if self.pigment is not None:
-            self.pigment.add(transform)
+        self.pigment.append(transform)
     def prepareRender(self):
         """
         Prepare an object for rendering.
@@ -85,28 +122,117 @@ class Renderable(Transformable):
         This must be called between any change to the object and rendering the object.
         This calls the overridden method, and calls ColorField::prepareRender() on the
         associated pigment if any.
+
+        On top of the full 4x4 matrices from Transformable.prepareRender(), this caches
+        the pieces the per-ray code actually touches -- the 3x3 rotation block and
+        3-vector translation of M_br, and the 3x3 block of N_rb -- as C-contiguous
+        float32 arrays. The render loop then never slices a 4x4 or converts dtype per
+        ray, and the float32 copies halve memory bandwidth on that path.
         """
         super().prepareRender()
-        if self.pigment is not None:
-            self.pigment.prepareRender()
+        self._M3=np.ascontiguousarray(self.M_br[0:3,0:3],dtype=np.float32)
+        self._Mt=np.ascontiguousarray(self.M_br[0:3,3],dtype=np.float32)
+        self._N3=np.ascontiguousarray(self.N_rb[0:3,0:3],dtype=np.float32)
+        # Flatten the pigment fallback chain -- walk up the parents once here, so
+        # evalPigment() doesn't recurse up the tree on every shading sample.
+        obj=self
+        while obj is not None and obj.pigment is _NULL_PIGMENT:
+            obj=obj.parent
+        self._effective_pigment=obj.pigment if obj is not None else _NULL_PIGMENT
+        self.pigment.prepareRender()
+        # Our local point may be reused as the pigment's only if pigment-local
+        # space *is* primitive-local space -- same M_br, not just same owner.
+        # A pigment that carried transforms of its own before this object's
+        # were appended has a different frame and must transform for itself.
+        pig=self._effective_pigment
+        self._pigment_local_ok=(pig is not _NULL_PIGMENT and pig is self.pigment
+                                and np.array_equal(pig.M_br,self.M_br))
+    def _localPoint(self,r:Position)->Position:
+        """
+        Transform a world point into body coordinates using the cached float32 blocks.
+
+        :param r: point in world coordinates
+        :return: (4,1) float32 point in body coordinates, equal to M_br @ r
+        """
+        rLocal=np.empty((4,1),dtype=np.float32)
+        rLocal[0:3,:]=self._M3 @ np.asarray(r,dtype=np.float32)[0:3,:]
+        rLocal[0:3,0]+=self._Mt
+        rLocal[3,0]=1.0
+        return rLocal
 
 
 # Type hint for list of renderables
 RenderableList=list[Renderable]
 
 
+def _asObjectScalar(prim):
+    """
+    Wrap a Renderable in a length-1 object array so masked assignment into an
+    object array stores the Renderable itself. Transformable defines __len__
+    and __getitem__ (it used to be a list subclass outright), which is enough
+    for numpy to treat a bare Renderable on the right of a masked assignment
+    as a sequence to broadcast element by element.
+
+    :param prim: object to wrap
+    :return: (1,) object ndarray holding prim
+    """
+    arr=np.empty(1,dtype=object)
+    arr[0]=prim
+    return arr
+
+
+# Generated world-normal transforms are cached keyed by the byte pattern of
+# the primitive's float32 normal-matrix block (bytes are hashable and compare
+# as a memcmp, same trick as the point-toward memo). Scenes built by
+# instancing get one function per distinct matrix, not one per primitive. The
+# cache is bounded: an animated scene re-prepares moved objects every frame
+# with a fresh matrix each time, and an unbounded cache would retain one
+# generated function per object per frame forever.
+@functools.lru_cache(maxsize=4096)
+def _makeNormalXform(N3bytes:bytes):
+    """
+    Build (or fetch from cache) a function mapping a local normal to the unit
+    world normal for the given 3x3 normal-matrix block.
+
+    The nine matrix entries are baked into the generated source as literals,
+    so the returned function does straight scalar arithmetic -- no matrix
+    attribute loads and no numpy matvec dispatch on the per-hit path. This is
+    partial evaluation of the normal pipeline with respect to the transform.
+
+    :param N3bytes: the .tobytes() of the (3,3) float32 upper-left block of
+      N_rb, as cached by Renderable.prepareRender()
+    :return: function (nLocal, sign) -> (4,1) float32 world normal of unit
+      length, where nLocal is a (4,1) local normal and sign is 1.0 for a
+      right-side-out primitive or -1.0 for an inside-out one
+    """
+    N3=np.frombuffer(N3bytes,dtype=np.float32).reshape(3,3)
+    src=("def _xform(nLocal,sign):\n"
+         "    nl0=float(nLocal[0,0]);nl1=float(nLocal[1,0]);nl2=float(nLocal[2,0])\n"
+         f"    nx={float(N3[0,0])!r}*nl0+{float(N3[0,1])!r}*nl1+{float(N3[0,2])!r}*nl2\n"
+         f"    ny={float(N3[1,0])!r}*nl0+{float(N3[1,1])!r}*nl1+{float(N3[1,2])!r}*nl2\n"
+         f"    nz={float(N3[2,0])!r}*nl0+{float(N3[2,1])!r}*nl1+{float(N3[2,2])!r}*nl2\n"
+         "    norm=sign*(nx*nx+ny*ny+nz*nz)**0.5\n"
+         "    out=np.empty((4,1),dtype=np.float32)\n"
+         "    out[0,0]=nx/norm;out[1,0]=ny/norm;out[2,0]=nz/norm;out[3,0]=0.0\n"
+         "    return out\n")
+    ns={'np':np}
+    exec(src,ns)
+    return ns['_xform']
+
+
 class Primitive(Renderable):
     """
     Primitive object -- IE one that directly has geometry itself, rather than being a composite of other
     renderables. Subclasses of this only need to deal with local coordinates.
     """
-    def _intersectLocal(self,rayLocal:Ray)->tuple[bool,float]:
+    def _intersectLocal(self,rayLocal:RayBatch)->tuple:
         r"""
-        Intersect a ray with this object, in object local space.
+        Intersect a batch of rays with this object, in object local space.
 
-        :param rayLocal: ray in local object space
-        :return: Tuple: First element is True if there is an intersection, false otherwise. Second element
-          is ray parameter $t$ at intersection, and is unspecified if first element is False.
+        :param rayLocal: RayBatch in local object space
+        :return: Tuple: First element is an (N,) boolean mask, true for each ray that intersects.
+          Second element is the (N,) array of ray parameters $t$ at intersection, and is
+          unspecified wherever the mask is false.
 
            \f$
              \def\M#1{{[\mathbf{#1}]}}
@@ -189,9 +315,10 @@ class Primitive(Renderable):
         If no other root satisfies the constraint, there is no intersection even though the ray would
         hit the infinite continuation of your constrained primitive.
 
-        So, set the output parameter `t` to the one with the smallest positive \f$t\f$ that
-        satisfies the constraint, then return true. If there are no intersections, or if all
-        intersections have negative \f$t\f$, or they all don't satisfy the constraint, return false.
+        So, for each ray in the batch, set its slot in the returned `t` array to the root with
+        the smallest positive \f$t\f$ that satisfies the constraint, and its slot in the mask
+        to true. If a ray has no intersections, or all of its intersections have negative
+        \f$t\f$, or they all don't satisfy the constraint, set its slot in the mask to false.
         """
         raise NotImplementedError("Abstract method")
 
@@ -220,19 +347,109 @@ class Primitive(Renderable):
         """
         raise NotImplementedError("Abstract method")
     def __init__(self):
+        super().__init__()
         # If true, the object is inside out. Primitive::inside() is inverted and the
         # direction of the normal is reversed for inside-out images.
         self.inside_out=False
-    def intersect(self,ray:Ray,t:float):
-        if self.intersectLocal(self.M_br @ ray, t):
-            return self
-        else:
-            return None
-    def normal(self,r:Position)->Direction:
+    def intersect(self,rays:RayBatch):
+        """
+        Intersect a batch of rays with this primitive, in world space.
+
+        :param rays: RayBatch in world space
+        :return: Tuple of (N,) hit mask and (N,) t parameter array, as documented
+          in Renderable.intersect(). The whole batch is transformed into local
+          space with a single compiled kernel call on the cached float32
+          blocks, then handed to the descendant's _intersectLocal().
+        """
+        r0Local=np.empty_like(rays.r0)
+        vLocal=np.empty_like(rays.v)
+        ray_transform_batch(self._M3,self._Mt,rays.r0,rays.v,r0Local,vLocal)
+        return self._intersectLocalBound(RayBatch.fromContiguous(r0Local,vLocal))
+    def trace(self,rays:RayBatch,packet_stride:int=8):
+        hit,t=self.intersect(rays)
+        prims=np.full(len(rays),None,dtype=object)
+        prims[hit]=_asObjectScalar(self)
+        return prims,np.where(hit,t,np.float32(np.inf)).astype(np.float32)
+    # Fused single-kernel trace for this primitive type, or None if the type
+    # hasn't got one. See kwantrace._trace_nb -- subclasses whose whole
+    # transform/intersect/normal/shade pipeline is closed-form point this at a
+    # compiled kernel with the trace_sphere() signature.
+    _fused_kernel=None
+    # Whole-family intersect kernel with the sphere_intersect_all() signature,
+    # or None. A Composite whose bounded children all belong to types with one
+    # of these can test a ray batch against each family in a single call on
+    # struct-of-arrays transform stacks -- see Composite.prepareRender().
+    _soa_kernel=None
+    def traceFused(self,rays:RayBatch,out_t:np.ndarray,out_n:np.ndarray,
+                   out_c:np.ndarray)->bool:
+        """
+        Trace a batch of rays through the fused kernel, if this primitive has
+        one and its shading is simple enough to fuse.
+
+        The fused path runs transform, root-finding, normal, and pigment for
+        each ray in registers, storing only the final results -- none of the
+        intermediate batch arrays the staged methods would allocate. It only
+        applies when the effective pigment is a ConstantColor, since an
+        arbitrary Field can't be baked into a compiled kernel.
+
+        :param rays: RayBatch in world space
+        :param out_t: (N,) float32 buffer for the hit parameters, inf for misses
+        :param out_n: (N,3) float32 buffer for the world-space unit normals
+        :param out_c: (N,5) float32 buffer for the colors
+        :return: True if the fused kernel ran and the buffers are filled, False
+          if the caller must use the staged methods instead
+        """
+        kernel=type(self)._fused_kernel
+        if kernel is None or not isinstance(self._effective_pigment,ConstantColor):
+            return False
+        # Inside-out primitives flip their normals; the kernels don't know
+        # about that, so let the staged path (whose normal() is rebound to
+        # the inside-out variant in prepareRender) handle them
+        if self.inside_out:
+            return False
+        kernel(rays.r0,rays.v,self._M3,self._Mt,self._N3,
+               self._effective_pigment._value,out_t,out_n,out_c)
+        return True
+    def _bboxLocal(self):
+        """
+        Axis-aligned bounding box of this primitive, in object local space.
+
+        :return: Tuple of 3-vector minimum corner and 3-vector maximum corner.
+          The box does not have to be tight, but must enclose the whole surface.
+          The default is unbounded, which is correct for primitives of infinite
+          extent (planes and the like) -- such primitives are excluded from any
+          acceleration structure and always tested directly.
+        """
+        return np.full(3,-np.inf),np.full(3,np.inf)
+    def bboxWorld(self):
+        """
+        Axis-aligned bounding box of this primitive, in world space.
+
+        Only valid between a call to prepareRender() and any change to the
+        transforms. The local box's eight corners are run through M_rb and
+        re-boxed -- not tight after a rotation, but still enclosing.
+
+        :return: Tuple of 3-vector minimum corner and 3-vector maximum corner
+        """
+        bmin,bmax=self._bboxLocal()
+        if not (np.all(np.isfinite(bmin)) and np.all(np.isfinite(bmax))):
+            return np.full(3,-np.inf),np.full(3,np.inf)
+        corners=np.empty((8,4))
+        for i in range(8):
+            corners[i,0]=bmin[0] if i&1==0 else bmax[0]
+            corners[i,1]=bmin[1] if i&2==0 else bmax[1]
+            corners[i,2]=bmin[2] if i&4==0 else bmax[2]
+            corners[i,3]=1.0
+        world=(self.M_rb @ corners.T).T
+        return np.min(world[:,0:3],axis=0),np.max(world[:,0:3],axis=0)
+    def normal(self,r:Position,rLocal:Position=None)->Direction:
         r"""
         Calculate the surface normal at a given point in world coordinates.
 
         :param r: point in world coordinates at which to calculate the normal
+        :param rLocal: Optional already-transformed point in body coordinates. The
+          shading path calls normal(), inside(), and evalPigment() on the same hit
+          point, so it computes `M_br @ r` once and passes it to all three.
         :return: Unit normal vector in world coordinates
 
         This transforms the point to body coordinates, calls the descendant's
@@ -318,19 +535,259 @@ class Primitive(Renderable):
         we will make sure to return a unit normal.
 
         Also, if the primitive is inside out, we will reverse the direction of the normal.
+
+        prepareRender() rebinds this name on the instance to one of the two
+        specialized straight-line bodies below, so the inside_out branch is
+        decided once per render instead of once per ray.
+        """
+        if self.inside_out:
+            return self._normalInsideOut(r,rLocal)
+        return self._normalDefault(r,rLocal)
+    def _normalDefault(self,r:Position,rLocal:Position=None)->Direction:
+        """
+        Straight-line normal() body for a right-side-out primitive. The
+        world-normal transform is the generated function specialized to this
+        primitive's matrix, see _makeNormalXform().
         """
-        return (-1 if self.inside_out else 1) * vnormalize(self.N_rb * self._normalLocal(self.M_br @ r))
-    def inside(self,r:Position)->bool:
+        if rLocal is None:
+            rLocal=self._localPoint(r)
+        return self._normalXform(self._normalLocal(rLocal),1.0)
+    def _normalInsideOut(self,r:Position,rLocal:Position=None)->Direction:
+        """
+        Straight-line normal() body for an inside-out primitive -- same as
+        _normalDefault() with the direction reversed.
+        """
+        if rLocal is None:
+            rLocal=self._localPoint(r)
+        return self._normalXform(self._normalLocal(rLocal),-1.0)
+    def inside(self,r:Position,rLocal:Position=None)->bool:
         """
         Calculate if a point is inside the primitive.
 
-        :param r:
+        :param r: point in world coordinates
+        :param rLocal: Optional already-transformed point in body coordinates,
+          reused if provided as in normal().
         :return: True if point is inside the primitive
 
         This transforms the point to body coordinates, calls the descendant's
-        Primitive::insideLocal() on the point, and returns the result.
+        Primitive::_insideLocal() on the point, and returns the result.
 
         This code takes into account inside_out, so the descendant
         doesn't have to (and shouldn't).
+
+        As with normal(), prepareRender() rebinds this name on the instance to
+        one of the specialized bodies below.
+        """
+        if self.inside_out:
+            return self._insideInsideOut(r,rLocal)
+        return self._insideDefault(r,rLocal)
+    def _insideDefault(self,r:Position,rLocal:Position=None)->bool:
+        """
+        Straight-line inside() body for a right-side-out primitive.
+        """
+        if rLocal is None:
+            rLocal=self._localPoint(r)
+        return self._insideLocal(rLocal)
+    def _insideInsideOut(self,r:Position,rLocal:Position=None)->bool:
+        """
+        Straight-line inside() body for an inside-out primitive.
+        """
+        if rLocal is None:
+            rLocal=self._localPoint(r)
+        return not self._insideLocal(rLocal)
+    def prepareRender(self):
+        """
+        Prepare the primitive for rendering.
+
+        On top of the inherited behavior, this specializes normal() and inside()
+        for the current value of inside_out by binding the matching straight-line
+        body on the instance -- runtime specialization that hoists the branch out
+        of the per-ray hot path.
+        """
+        super().prepareRender()
+        if self.inside_out:
+            self.normal=self._normalInsideOut
+            self.inside=self._insideInsideOut
+        else:
+            self.normal=self._normalDefault
+            self.inside=self._insideDefault
+        # Bind the descendant's _intersectLocal once -- intersect() is called for
+        # every node visit of every batch, and the cached bound method skips the
+        # attribute lookup and descriptor binding on each of those calls.
+        self._intersectLocalBound=self._intersectLocal
+        # Specialize the world-normal transform to this primitive's matrix --
+        # instances sharing a transform share the generated function
+        self._normalXform=_makeNormalXform(self._N3.tobytes())
+
+
+class Composite(Renderable):
+    """
+    A Renderable made of other Renderables.
+
+    Children may be Primitives or further Composites, so a scene is an
+    arbitrarily deep tree with Primitives at the leaves. The Composite's own
+    pigment acts as the default for any child that doesn't set one.
+
+    Rather than testing every child against every ray, prepareRender() builds a
+    BVH over the children's world-space bounding boxes, so a ray only visits
+    the children whose boxes it enters. Children of infinite extent (no usable
+    bounding box) are kept in a separate list and always tested directly.
+    """
+    # Largest bounded-child count for which trace() prefers the flat
+    # struct-of-arrays kernels over the BVH -- below this, one brute-force
+    # pass per primitive family is cheaper than tree traversal from Python
+    _SOA_MAX=64
+    def __init__(self,Lchildren:RenderableList=None):
+        """
+        Construct a composite from an optional initial list of children.
+
+        :param Lchildren: Children to add, may be None
+        """
+        super().__init__()
+        self.children=[] if Lchildren is None else list(Lchildren)
+    def addChild(self,child:Renderable):
+        """
+        Add a child to this composite.
+
+        :param child: Renderable to add
+
+        (This can't be called `append`, since that name already means "add a
+        transformation" on every Transformable.)
+        """
+        self.children.append(child)
+    def prepareRender(self):
+        """
+        Prepare the composite and all of its children for rendering.
+
+        Each child gets its parent pointer set (for pigment inheritance) and its
+        own prepareRender() called, then the children's world bounding boxes are
+        gathered and the BVH is built over the bounded ones.
+        """
+        super().prepareRender()
+        for child in self.children:
+            child.setParent(self)
+            child.prepareRender()
+        self._bounded=[]
+        self._unbounded=[]
+        box_min=[]
+        box_max=[]
+        for child in self.children:
+            bmin,bmax=child.bboxWorld()
+            if np.all(np.isfinite(bmin)) and np.all(np.isfinite(bmax)):
+                self._bounded.append(child)
+                box_min.append(bmin)
+                box_max.append(bmax)
+            else:
+                self._unbounded.append(child)
+        self._bvh=BVH(np.array(box_min),np.array(box_max)) if len(self._bounded)>0 else None
+        # Group bounded children by type for the struct-of-arrays fast path:
+        # each family's world-to-local transforms are stacked into parallel
+        # arrays, so trace() can test a ray batch against the whole family in
+        # one kernel call instead of dispatching per child. Only usable when
+        # every bounded child belongs to a family with a kernel.
+        families={}
+        self._soa_all=True
+        for child in self._bounded:
+            if getattr(type(child),'_soa_kernel',None) is None:
+                self._soa_all=False
+                break
+            families.setdefault(type(child),[]).append(child)
+        self._groups=[]
+        if self._soa_all:
+            for family,members in families.items():
+                M3=np.empty((len(members),3,3),dtype=np.float32)
+                Mt=np.empty((len(members),3),dtype=np.float32)
+                for j,child in enumerate(members):
+                    M3[j,:,:]=child._M3
+                    Mt[j,:]=child._Mt
+                self._groups.append((family._soa_kernel,members,M3,Mt))
+    def bboxWorld(self):
+        """
+        World bounding box of the whole composite -- the box around all of the
+        children's boxes. Unbounded if any child is unbounded. Only valid after
+        prepareRender().
+
+        :return: Tuple of 3-vector minimum corner and 3-vector maximum corner
+        """
+        if len(self._unbounded)>0 or self._bvh is None:
+            return np.full(3,-np.inf),np.full(3,np.inf)
+        return self._bvh.aabb_min[0,:].astype(np.float64),self._bvh.aabb_max[0,:].astype(np.float64)
+    def trace(self,rays:RayBatch,packet_stride:int=8):
+        """
+        Find the nearest visible child surface for each ray, as documented in
+        Renderable.trace().
+
+        :param rays: RayBatch in world space
+        :param packet_stride: rays per traversal packet. The tree is walked
+          once per packet of consecutive (and for primary rays, spatially
+          coherent) rays, so the per-node active mask stays narrow and a
+          subtree is skipped as soon as the whole packet misses its box.
+        """
+        N=len(rays)
+        prims=np.full(N,None,dtype=object)
+        t_best=np.full(N,np.inf,dtype=np.float32)
+        if self._soa_all and 0<len(self._bounded)<=self._SOA_MAX:
+            # Struct-of-arrays fast path: every bounded child belongs to a
+            # family with a whole-family kernel, and there are few enough of
+            # them that one brute-force kernel pass per family beats walking
+            # the BVH from Python.
+            which=np.empty(N,dtype=np.int32)
+            t=np.empty(N,dtype=np.float32)
+            for kernel,members,M3,Mt in self._groups:
+                kernel(rays.r0,rays.v,M3,Mt,which,t)
+                better=t<t_best
+                t_best[better]=t[better]
+                for j,child in enumerate(members):
+                    prims[better&(which==j)]=_asObjectScalar(child)
+        elif self._bvh is not None:
+            for start,packet in rays.packets(packet_stride):
+                # The BVH calls back per visited leaf; stash each leaf's
+                # primitive array so the winners can be resolved afterwards.
+                leaf_prims={}
+                def leafIntersect(i,r,_cache=leaf_prims):
+                    child_prims,t=self._bounded[i].trace(r)
+                    _cache[i]=child_prims
+                    return child_prims!=None,t
+                which,t_packet=self._bvh.intersect(packet,leafIntersect)
+                prims_packet=prims[start:start+len(packet)]
+                t_best[start:start+len(packet)]=t_packet
+                for i,cached in leaf_prims.items():
+                    sel=which==i
+                    prims_packet[sel]=cached[sel]
+        for child in self._unbounded:
+            child_prims,t=child.trace(rays)
+            better=t<t_best
+            prims[better]=child_prims[better]
+            t_best[better]=t[better]
+        return prims,t_best
+    def traceGPU(self,rays:RayBatch):
+        """
+        Trace a batch of rays on the GPU, if possible.
+
+        The CUDA kernel cannot call back into Python per leaf, so the GPU path
+        only covers the case it can express entirely in arrays: every bounded
+        child is a Sphere (fully described by its cached world-to-local
+        transform) and there are no unbounded children. Anything else, or no
+        usable CUDA device, falls back to the CPU trace() with the same result.
+
+        :param rays: RayBatch in world space
+        :return: same contract as trace()
+        """
+        from kwantrace._gpu_trace import cudaAvailable,traceSpheres
+        from kwantrace.sphere import Sphere
+        if (not cudaAvailable() or self._bvh is None or len(self._unbounded)>0
+                or any(type(child) is not Sphere for child in self._bounded)):
+            return self.trace(rays)
+        which,t=traceSpheres(self._bvh,self._bounded,rays)
+        prims=np.full(len(rays),None,dtype=object)
+        for j,child in enumerate(self._bounded):
+            prims[which==j]=_asObjectScalar(child)
+        return prims,t
+    def intersect(self,rays:RayBatch):
+        prims,t=self.trace(rays)
+        return prims!=None,t
+    def inside(self,r:Position,rLocal:Position=None)->bool:
+        """
+        A point is inside the composite if it is inside any child.
         """
-        return self.inside_out ^ self.insideLocal(self.M_br @ r)
+        return any(child.inside(r) for child in self.children)
@@ -0,0 +1,51 @@
+import numpy as np
+
+from kwantrace._trace_nb import trace_sphere, sphere_intersect_all
+from kwantrace.position_direction import Position, Direction
+from kwantrace.ray import RayBatch
+from kwantrace.renderable import Primitive
+
+
+class Sphere(Primitive):
+    r"""
+    A unit sphere centered on the local origin.
+
+    Like in POV-Ray, any other sphere is made from this one with transformations --
+    scale it to the radius you want (anisotropic scaling gets you an ellipsoid)
+    and translate it to where you want it.
+
+    The implicit function is \f$f(\vec{r})=x^2+y^2+z^2-1\f$, so the intersection
+    equation \f$f(\vec{r}_0+\vec{v}t)=0\f$ is the quadratic
+
+    \f$(\vec{v}\cdot\vec{v})t^2+2(\vec{r}_0\cdot\vec{v})t+(\vec{r}_0\cdot\vec{r}_0-1)=0\f$
+    """
+    # The whole sphere pipeline is closed-form, so it has a fused kernel --
+    # see Primitive.traceFused()
+    _fused_kernel=staticmethod(trace_sphere)
+    # ...and a whole-family kernel for the struct-of-arrays path, see
+    # Composite.prepareRender()
+    _soa_kernel=staticmethod(sphere_intersect_all)
+    def _intersectLocal(self,rayLocal:RayBatch):
+        a=np.sum(rayLocal.v**2,axis=1)
+        b=2.0*np.sum(rayLocal.r0*rayLocal.v,axis=1)
+        c=np.sum(rayLocal.r0**2,axis=1)-1.0
+        d=b**2-4.0*a*c
+        hit=d>=0
+        sqrtd=np.sqrt(np.where(hit,d,0.0))
+        # Smaller root first -- if the ray starts inside the sphere, that root is
+        # behind the initial point, so fall back to the larger one
+        t=(-b-sqrtd)/(2.0*a)
+        tFar=(-b+sqrtd)/(2.0*a)
+        t=np.where(t>0,t,tFar)
+        hit=hit & (t>0)
+        return hit,t
+    def _normalLocal(self,rLocal:Position)->Direction:
+        # For a sphere around the origin, the normal is just the surface point
+        # itself, reinterpreted as a direction
+        n=np.array(rLocal,dtype=np.float32).reshape(4,1)
+        n[3,0]=0.0
+        return n
+    def _insideLocal(self,rLocal:Position)->bool:
+        return bool(np.sum(np.asarray(rLocal).ravel()[0:3]**2)<1.0)
+    def _bboxLocal(self):
+        return np.array([-1.0,-1.0,-1.0]),np.array([1.0,1.0,1.0])
@@ -1,12 +1,18 @@
 # List of pointers to transforms
 import numpy as np
 
-from transformation import Transformation
+from kwantrace._transformation_nb import combine_invert, reduce_combine
+from kwantrace.transformation import Transformation
 
 TransformList=list[Transformation]
 
+# Shared identity for the no-transforms case -- read-only so nobody can
+# scribble on the copy everybody gets
+_I4=np.identity(4)
+_I4.setflags(write=False)
 
-class Transformable(list[Transformation]):
+
+class Transformable:
     r"""
     Entity that can be transformed.
 
@@ -30,7 +36,65 @@ class Transformable(list[Transformation]):
     possible, to save as much time effort during the render. This makes sense, because the render will be
     called literally millions of times. You may chain literally any number of transformations, and only pay
     the cost at prepareRender(). During the render, the cost of 0, 1, or 1000 transformations are all the same.
+
+    The chain lives in the transforms attribute, a plain list of
+    Transformation objects. This class used to *be* that list (a list
+    subclass), but that made every Transformable look like a sequence to
+    numpy -- object arrays of primitives broadcast them element by element
+    and == compared them like lists -- and blocked hashing. Holding the list
+    as an attribute keeps the container behavior (len/iteration/indexing/
+    append still work on the Transformable itself) without being one.
     """
+    def __init__(self,Ltransforms:TransformList=None):
+        """
+        Construct a Transformable, optionally from an initial list of
+        transformations.
+
+        :param Ltransforms: Transformations to start with, may be None
+        """
+        self.transforms=[] if Ltransforms is None else list(Ltransforms)
+    def append(self,transform:Transformation):
+        """
+        Add a transformation to the end of the chain.
+
+        :param transform: Transformation to add
+        """
+        self.transforms.append(transform)
+    def __len__(self):
+        return len(self.transforms)
+    def __iter__(self):
+        return iter(self.transforms)
+    def __getitem__(self,i):
+        return self.transforms[i]
+    # Cached (K,4,4) stack of the member matrices, and the list of cached
+    # per-transformation arrays it was built from. Class attributes so
+    # subclasses don't have to thread anything through __init__.
+    _stack=None
+    _stackSrc=None
+    def _getStack(self)->np.array:
+        """
+        Return the member matrices stacked into one contiguous (K,4,4)
+        array, rebuilding it only when something actually changed.
+
+        Staleness is detected by identity rather than by hooking the list
+        mutators: each Transformation caches its matrix and throws the
+        cached array away when a parameter is assigned, so the stack is
+        current exactly when every member's cached array is still the one
+        that was stacked. That check is K pointer comparisons, and unlike
+        mutator hooks it also catches parameter changes inside a member.
+
+        :return: (K,4,4) array, member i's matrix at [i,:,:]. Do not write
+          to it -- it is reused until the transforms change.
+        """
+        stack=self._stack
+        src=self._stackSrc
+        if stack is not None and stack.shape[0]==len(self) \
+           and all(t._cached is s for t,s in zip(self,src)):
+            return stack
+        stack=np.stack([t.matrix() for t in self])
+        self._stack=stack
+        self._stackSrc=[t._cached for t in self]
+        return stack
     def combine(self):
         """
         Combine transformations in the transformation list.
@@ -42,10 +106,20 @@ class Transformable(list[Transformation]):
 
         :return: Matrix representing the combination of all transformations performed in order.
         """
-        result=np.identity(4)
-        for trans in self:
-            result=trans.matrix() @ result
-        return result
+        if len(self.transforms)==0:
+            return _I4.copy()
+        if len(self.transforms)==1:
+            # A single translate or rotate is the dominant chain length --
+            # no combining to do, so skip the stack and the kernel call. The
+            # copy is because matrix() returns the cached read-only array.
+            return self.transforms[0].matrix().copy()
+        # The whole chain reduces inside one compiled kernel over the cached
+        # contiguous stack -- no per-step Python dispatch, no per-step
+        # temporaries, and no identity start to multiply away.
+        return reduce_combine(self._getStack())
+    # The stack M_rb was last computed from, for short-circuiting
+    # prepareRender when nothing changed
+    _preparedFrom=None
     def prepareRender(self):
         """
         Prepare for rendering.
@@ -56,8 +130,94 @@ class Transformable(list[Transformation]):
         Those ancillary matrices are only valid between a call to prepareRender() and any changes
         to any transforms in this list.
 
+        Calling this again with nothing changed is O(1): _getStack() returns
+        the identical stack object for as long as every member matrix is
+        unchanged, so comparing it by identity against the stack the current
+        M_rb was computed from tells whether there is anything to redo. An
+        animation that re-prepares the whole scene each frame only pays for
+        the objects that actually moved.
         """
-        self.M_rb=self.combine()   # reference from body transformation matrix
-        self.M_br=np.linalg.inv(self.M_rb) # body from reference transformation matrix
-        self.N_rb=self.M_br.T              # body from reference transformation for normal vectors
+        if len(self.transforms)==0:
+            if _I4 is self._preparedFrom:
+                return
+            self._preparedFrom=_I4
+            self.M_rb=_I4.copy()   # reference from body transformation matrix
+            self.M_br=_I4.copy()   # body from reference transformation matrix
+            # Contiguous like the kernel-filled case below, not a transpose
+            # view -- downstream code slices N_rb for its kernels and
+            # shouldn't find a strided surprise on untransformed objects
+            self.N_rb=_I4.copy()   # body from reference transformation for normal vectors
+            return
+        stack=self._getStack()
+        if stack is self._preparedFrom:
+            return
+        prev=self._preparedFrom
+        # Record-and-replay: if the only change since the last prepare is
+        # appended transforms (the old stack is a byte-identical prefix of
+        # the new one), don't recombine the whole chain -- seed the kernel
+        # with the already-combined M_rb and replay just the new tail onto
+        # it. Appending to a long chain is O(appended), not O(K).
+        if prev is not None and prev is not _I4 \
+           and 0<prev.shape[0]<stack.shape[0] \
+           and prev.dtype==stack.dtype \
+           and np.array_equal(stack[0:prev.shape[0]],prev):
+            seed=np.concatenate((self.M_rb[None,:,:],stack[prev.shape[0]:]))
+        else:
+            seed=stack
+        self._preparedFrom=stack
+        # All three matrices come out of one fused kernel call: the chain
+        # reduction, the closed-form affine inverse, and the normal matrix
+        # (the transpose of M_br, materialized contiguously so kernels can
+        # slice it without a copy). No numpy dispatch between the stages.
+        self.M_rb=np.empty((4,4),dtype=stack.dtype)
+        self.M_br=np.empty((4,4),dtype=stack.dtype)
+        self.N_rb=np.empty((4,4),dtype=stack.dtype)
+        # A chain of rigid transforms has an orthonormal linear block, so
+        # the kernel can invert it by transposing
+        rigid=all(t.isRigid() for t in self.transforms)
+        combine_invert(seed,self.M_rb,self.M_br,self.N_rb,rigid)
+
+
+def prepareAll(transformables:list[Transformable]):
+    """
+    Prepare many Transformables in one batched pass.
+
+    Calling prepareRender() per object costs a handful of small numpy calls
+    each; over thousands of objects the per-call dispatch dwarfs the
+    arithmetic. This gathers every object that actually needs re-preparing
+    (the same staleness test prepareRender uses), combines each chain with
+    the compiled reduction, then inverts all the results with one batched
+    np.linalg.inv over the (N,3,3) linear blocks -- one dispatch amortized
+    over the whole scene -- and writes M_rb/M_br/N_rb back per object.
+
+    This covers the Transformable layer only: subclasses that do extra work
+    in their prepareRender() override (Renderable caching its render-dtype
+    blocks, say) still need that called, but the matrix part will
+    short-circuit.
+
+    :param transformables: Transformables to prepare, in any order
+    """
+    stale=[]
+    for obj in transformables:
+        stack=obj._getStack() if len(obj)>0 else _I4
+        if stack is not obj._preparedFrom:
+            stale.append((obj,stack))
+    if not stale:
+        return
+    M=np.stack([obj.combine() for obj,_ in stale])
+    # Batched affine inverse: invert all the 3x3 blocks in one call, then
+    # the translation columns are -Rinv t, batched as one einsum
+    Ri=np.linalg.inv(M[:,0:3,0:3])
+    Minv=np.zeros_like(M)
+    Minv[:,0:3,0:3]=Ri
+    Minv[:,0:3,3]=-np.einsum('nij,nj->ni',Ri,M[:,0:3,3],optimize=True)
+    Minv[:,3,3]=1.0
+    for i,(obj,stack) in enumerate(stale):
+        # Copies, for two reasons: a slice view would pin the whole batch
+        # array alive through any one object, and N_rb must be C-contiguous
+        # (never a transpose view) like every prepareRender path leaves it
+        obj.M_rb=M[i].copy()
+        obj.M_br=Minv[i].copy()
+        obj.N_rb=np.ascontiguousarray(Minv[i].T)
+        obj._preparedFrom=stack
 
@@ -3,11 +3,26 @@ KwanTrace_py - Python Ray Tracing Library
 Copyright (C) 2023 by kwan3217
 
 """
+import functools
+import math
+
 import numpy as np
-from kwanmath.matrix import rot_axis
-from kwanmath.vector import vnormalize, vcross
 
-from position_direction import col_vector, Direction
+from kwantrace._transformation_nb import point_toward, trs_batch
+from kwantrace.position_direction import col_vector, Direction
+
+# Degrees-to-radians factor as a plain float -- a scalar multiply, where
+# np.deg2rad on a scalar would be a full ufunc dispatch
+_DEG2RAD=np.pi/180.0
+
+# Dtype of every matrix built in this module. Transformation matrices are
+# built and composed rarely (only when parameters change, thanks to the
+# matrix() cache) but multiplied against many rays, so they stay float64 by
+# default for accuracy and prepareRender() converts the combined result to
+# the render dtype once per scene change. Set this to np.float32 to keep the
+# whole pipeline in single precision -- half the storage and double the SIMD
+# lane count -- where that precision is acceptable.
+MATRIX_DTYPE=np.float64
 
 
 class Transformation:
@@ -26,7 +41,34 @@ class Transformation:
     I have to call this "Transformation" instead of "Transformer" because otherwise I will be
     thinking about robots in disguise...
     """
+    def __init__(self):
+        self._cached=None
+    def __setattr__(self,name,value):
+        # Every public attribute is a transformation parameter, so any
+        # assignment to one invalidates the cached matrix. Underscore
+        # attributes (including the cache itself) don't.
+        if not name.startswith('_'):
+            self.__dict__['_cached']=None
+        object.__setattr__(self,name,value)
     def matrix(self)->np.array:
+        """
+        Return the matrix for this transformation.
+
+        Scene graphs ask for the matrix far more often than the parameters
+        change, so the matrix computed by the subclass's _calcMatrix() is
+        cached here and recomputed only after a parameter assignment. The
+        cached array is marked read-only so an accidental in-place edit
+        fails loudly instead of silently desynchronizing it from the
+        parameters.
+
+        :return: Matrix representing the transformation
+        """
+        if self._cached is None:
+            cached=self._calcMatrix()
+            cached.setflags(write=False)
+            self._cached=cached
+        return self._cached
+    def _calcMatrix(self)->np.array:
         """
         Construct the matrix for this transformation.
 
@@ -34,6 +76,17 @@ class Transformation:
         :return: Matrix representing the transformation
         """
         raise NotImplementedError()
+    def isRigid(self)->bool:
+        """
+        Report whether this transformation is rigid -- a rotation and/or
+        translation, with no scale or shear. A chain of rigid
+        transformations has an orthonormal linear block, so its inverse is
+        just a transpose; Transformable.prepareRender exploits that. The
+        default is False, the safe answer for a subclass that doesn't say.
+
+        :return: True if the matrix is guaranteed rigid
+        """
+        return False
 
 
 class Translation(Transformation):
@@ -44,13 +97,23 @@ class Translation(Transformation):
     """
     def __init__(self,Lamount:np.array=None,Lx:float=None,Ly:float=None,Lz:float=None):
         if Lamount is None:
-            self.amount=col_vector(Lx,Ly,Lz)
+            self.amount=np.array([Lx,Ly,Lz],dtype=np.float64)
         else:
-            self.amount=Lamount.reshape(3,1)
-    def matrix(self)->np.array:
-        result=np.identity(4)
-        result[0,0:3]=self.amount[:]
+            # Flat copy of the first three components -- this accepts a plain
+            # 3-vector, a column vector, or a full (4,1) Position
+            self.amount=np.asarray(Lamount,dtype=np.float64).ravel()[0:3].copy()
+    def _calcMatrix(self)->np.array:
+        # Build the matrix directly rather than through np.identity(), which
+        # zeroes 16 slots that are mostly overwritten right away
+        result=np.zeros((4,4),dtype=MATRIX_DTYPE)
+        result[0,0]=1.0
+        result[1,1]=1.0
+        result[2,2]=1.0
+        result[3,3]=1.0
+        result[0:3,3]=self.amount
         return result
+    def isRigid(self)->bool:
+        return True
 
 
 class Scaling(Transformation):
@@ -68,11 +131,12 @@ class Scaling(Transformation):
             self.amount = col_vector(Lx, Ly, Lz)
         else:
             self.amount = Lamount.reshape(3, 1)
-    def matrix(self) -> np.array:
-        result = np.identity(4)
-        result[0, 0] = self.amount[0] if self.amount[0]!=0 else 1.0
-        result[1, 1] = self.amount[1] if self.amount[1]!=0 else 1.0
-        result[2, 2] = self.amount[2] if self.amount[2]!=0 else 1.0
+    def _calcMatrix(self) -> np.array:
+        result = np.zeros((4,4),dtype=MATRIX_DTYPE)
+        result[0, 0] = self.amount[0,0] if self.amount[0,0]!=0 else 1.0
+        result[1, 1] = self.amount[1,0] if self.amount[1,0]!=0 else 1.0
+        result[2, 2] = self.amount[2,0] if self.amount[2,0]!=0 else 1.0
+        result[3, 3] = 1.0
         return result
 
 
@@ -86,11 +150,13 @@ class UniformScaling(Transformation):
     """
     def __init__(self, Lamount: float = 1.0):
         self.amount = Lamount
-    def matrix(self) -> np.array:
-        result = np.identity(4)
-        result[0, 0] = self.amount if self.amount!=0 else 1.0
-        result[1, 1] = self.amount if self.amount!=0 else 1.0
-        result[2, 2] = self.amount if self.amount!=0 else 1.0
+    def _calcMatrix(self) -> np.array:
+        result = np.zeros((4,4),dtype=MATRIX_DTYPE)
+        s = self.amount if self.amount!=0 else 1.0
+        result[0, 0] = s
+        result[1, 1] = s
+        result[2, 2] = s
+        result[3, 3] = 1.0
         return result
 
 
@@ -119,25 +185,68 @@ class RotateScalar(Transformation):
         self.amount=Lamount
         self.axis=axis
         self.isDegrees=isDegrees
-    def matrix(self):
-        result=np.identity(4)
-        result[0:3,0:3]=rot_axis(self.axis,np.deg2rad(self.amount) if self.isDegrees else self.amount)
+    def _calcMatrix(self):
+        # Same cyclic construction for any axis: the rotation leaves axis i
+        # alone and rotates the (i+1, i+2) plane. math.cos/sin on the plain
+        # float skip numpy's scalar ufunc dispatch.
+        a=self.amount*_DEG2RAD if self.isDegrees else self.amount
+        c=math.cos(a);s=math.sin(a)
+        i=self.axis
+        j=(i+1)%3
+        k=(i+2)%3
+        result=np.zeros((4,4),dtype=MATRIX_DTYPE)
+        result[i,i]=1.0
+        result[j,j]=c;result[j,k]=-s
+        result[k,j]=s;result[k,k]=c
+        result[3,3]=1.0
         return result
+    def isRigid(self)->bool:
+        return True
 
 
 class RotateX(RotateScalar):
     def __init__(self,Lamount:float,isDegrees:bool=True):
         super().__init__(Lamount,0,isDegrees)
+    def _calcMatrix(self):
+        # The axis is fixed by the class, so skip the generic axis dispatch
+        # and write the closed form. math.cos/sin on a plain float skip the
+        # ufunc machinery np.cos would drag in for a scalar.
+        a=self.amount*_DEG2RAD if self.isDegrees else self.amount
+        c=math.cos(a);s=math.sin(a)
+        result=np.zeros((4,4),dtype=MATRIX_DTYPE)
+        result[0,0]=1.0
+        result[1,1]=c;result[1,2]=-s
+        result[2,1]=s;result[2,2]=c
+        result[3,3]=1.0
+        return result
 
 
 class RotateY(RotateScalar):
     def __init__(self, Lamount: float, isDegrees: bool = True):
         super().__init__(Lamount, 1, isDegrees)
+    def _calcMatrix(self):
+        a=self.amount*_DEG2RAD if self.isDegrees else self.amount
+        c=math.cos(a);s=math.sin(a)
+        result=np.zeros((4,4),dtype=MATRIX_DTYPE)
+        result[0,0]=c;result[0,2]=s
+        result[1,1]=1.0
+        result[2,0]=-s;result[2,2]=c
+        result[3,3]=1.0
+        return result
 
 
 class RotateZ(RotateScalar):
     def __init__(self,Lamount:float,isDegrees:bool=True):
         super().__init__(Lamount,2,isDegrees)
+    def _calcMatrix(self):
+        a=self.amount*_DEG2RAD if self.isDegrees else self.amount
+        c=math.cos(a);s=math.sin(a)
+        result=np.zeros((4,4),dtype=MATRIX_DTYPE)
+        result[0,0]=c;result[0,1]=-s
+        result[1,0]=s;result[1,1]=c
+        result[2,2]=1.0
+        result[3,3]=1.0
+        return result
 
 
 class RotateVector(Transformation):
@@ -169,12 +278,147 @@ class RotateVector(Transformation):
         else:
             self.amount = Lamount.reshape(3, 1)
         self.isDegrees=isDegrees
-    def matrix(self):
-        result=np.identity(4)
-        result[0:3,0:3]=rot_axis(0,np.deg2rad(self.amount[0]) if self.isDegrees else self.amount[0])
-        result[0:3,0:3]=rot_axis(1,np.deg2rad(self.amount[1]) if self.isDegrees else self.amount[1]) @ result[0:3,0:3]
-        result[0:3,0:3]=rot_axis(2,np.deg2rad(self.amount[2]) if self.isDegrees else self.amount[2]) @ result[0:3,0:3]
+    def _calcMatrix(self):
+        # The product R_z @ R_y @ R_x written out in closed form -- at 3x3,
+        # the dispatch cost of two matmuls and three rotation-matrix builds
+        # dwarfs the nine multiply-adds they amount to
+        a=np.asarray(self.amount,dtype=np.float64).ravel()
+        if self.isDegrees:
+            ax=a[0]*_DEG2RAD;ay=a[1]*_DEG2RAD;az=a[2]*_DEG2RAD
+        else:
+            ax=a[0];ay=a[1];az=a[2]
+        cx=np.cos(ax);sx=np.sin(ax)
+        cy=np.cos(ay);sy=np.sin(ay)
+        cz=np.cos(az);sz=np.sin(az)
+        result=np.zeros((4,4),dtype=MATRIX_DTYPE)
+        result[0,0]=cz*cy
+        result[0,1]=cz*sy*sx-sz*cx
+        result[0,2]=cz*sy*cx+sz*sx
+        result[1,0]=sz*cy
+        result[1,1]=sz*sy*sx+cz*cx
+        result[1,2]=sz*sy*cx-cz*sx
+        result[2,0]=-sy
+        result[2,1]=cy*sx
+        result[2,2]=cy*cx
+        result[3,3]=1.0
         return result
+    def isRigid(self)->bool:
+        return True
+
+
+class TRS(Transformation):
+    """
+    Represent the common translate-rotate-scale composition as one
+    transformation.
+
+    Chaining a Scaling, a RotateVector, and a Translation works, but builds
+    three 4x4 matrices and multiplies them even though the structure of the
+    product is fully known: the upper-left block is the rotation with its
+    columns scaled, and the last column is the translation. This class builds
+    that final matrix directly -- one allocation, no matmuls.
+
+    The rotation follows the RotateVector convention: a right-handed rotation
+    around x by the first component, then y, then z.
+    """
+    def __init__(self,Ltranslate=None,Lrotate=None,Lscale=None,isDegrees:bool=True):
+        """
+        Construct a translate-rotate-scale transformation. Omitted parts
+        default to "do nothing".
+
+        :param Ltranslate: translation vector, first three components used
+        :param Lrotate: rotation angles around x, y, z, as in RotateVector
+        :param Lscale: scale factor per axis, or a single scalar for uniform
+          scaling. Zero components are treated as 1, as in Scaling.
+        :param isDegrees: If true, the rotation angles are in degrees
+        """
+        self.translate=np.zeros(3) if Ltranslate is None \
+            else np.asarray(Ltranslate,dtype=np.float64).ravel()[0:3].copy()
+        self.rotate=np.zeros(3) if Lrotate is None \
+            else np.asarray(Lrotate,dtype=np.float64).ravel()[0:3].copy()
+        scale=np.ones(3) if Lscale is None \
+            else np.broadcast_to(np.asarray(Lscale,dtype=np.float64).ravel(),(3,)).copy()
+        scale[scale==0]=1.0
+        self.scale=scale
+        self.isDegrees=isDegrees
+    def _calcMatrix(self):
+        if self.isDegrees:
+            ax=self.rotate[0]*_DEG2RAD;ay=self.rotate[1]*_DEG2RAD;az=self.rotate[2]*_DEG2RAD
+        else:
+            ax,ay,az=self.rotate
+        cx=math.cos(ax);sx=math.sin(ax)
+        cy=math.cos(ay);sy=math.sin(ay)
+        cz=math.cos(az);sz=math.sin(az)
+        tx,ty,tz=self.translate
+        kx,ky,kz=self.scale
+        # T @ R @ S: the rotation's columns scaled, the translation dropped
+        # into the last column
+        result=np.empty((4,4),dtype=MATRIX_DTYPE)
+        result[0,0]=kx*(cz*cy)
+        result[0,1]=ky*(cz*sy*sx-sz*cx)
+        result[0,2]=kz*(cz*sy*cx+sz*sx)
+        result[0,3]=tx
+        result[1,0]=kx*(sz*cy)
+        result[1,1]=ky*(sz*sy*sx+cz*cx)
+        result[1,2]=kz*(sz*sy*cx-cz*sx)
+        result[1,3]=ty
+        result[2,0]=kx*(-sy)
+        result[2,1]=ky*(cy*sx)
+        result[2,2]=kz*(cy*cx)
+        result[2,3]=tz
+        result[3,0]=0.0;result[3,1]=0.0;result[3,2]=0.0;result[3,3]=1.0
+        return result
+    def isRigid(self)->bool:
+        # Rigid exactly when there is no actual scaling
+        return bool(np.all(self.scale==1.0))
+
+
+class TransformationBatch:
+    """
+    Structure-of-arrays batch of translate-rotate-scale transformations.
+
+    A scene with N animated objects held as N TRS instances pays N Python
+    calls and N small allocations every time the matrices are rebuilt. This
+    class keeps the parameters as (N,3) arrays -- translations, rotation
+    angles, scales -- and fills all N matrices in one compiled, parallel
+    kernel. The parameter arrays are public and meant to be edited in place
+    between calls (an animation writing the current frame's values, say).
+
+    This is not a Transformation: it produces a stack of independent
+    matrices, not one matrix, so it doesn't slot into a Transformable's
+    chain. Use it where the per-object matrix is the end product.
+    """
+    def __init__(self,Ltranslate:np.array,Lrotate:np.array,Lscale:np.array,isDegrees:bool=True):
+        """
+        Construct a TransformationBatch. All three arrays must have the same
+        number of rows.
+
+        :param Ltranslate: (N,3) translations
+        :param Lrotate: (N,3) rotation angles around x, y, z, per TRS
+        :param Lscale: (N,3) per-axis scale factors. Zero components are
+          treated as 1, as in Scaling.
+        :param isDegrees: If true, the rotation angles are in degrees
+        """
+        self.translate=np.ascontiguousarray(Ltranslate,dtype=np.float64).reshape(-1,3)
+        self.rotate=np.ascontiguousarray(Lrotate,dtype=np.float64).reshape(-1,3)
+        self.scale=np.ascontiguousarray(Lscale,dtype=np.float64).reshape(-1,3)
+        self.isDegrees=isDegrees
+    def __len__(self):
+        return self.translate.shape[0]
+    def computeMatrices(self,out:np.array=None)->np.array:
+        """
+        Build all N matrices from the current parameter arrays.
+
+        :param out: (N,4,4) float64 C-contiguous array to fill, or None to
+          allocate one. Pass the same buffer every frame to avoid the
+          allocation.
+        :return: (N,4,4) stack of matrices, the out parameter if given
+        """
+        if out is None:
+            out=np.empty((len(self),4,4))
+        rotate=self.rotate*_DEG2RAD if self.isDegrees else self.rotate
+        scale=np.where(self.scale==0,1.0,self.scale)
+        trs_batch(self.translate,rotate,scale,out)
+        return out
 
 
 def calcPointToward(p_b,p_r,t_b,t_r):
@@ -266,15 +510,41 @@ def calcPointToward(p_b,p_r,t_b,t_r):
   And that's the solution. Note that if you need \f$\MM{M}{_{br}}\f$, it is also a transpose
   since this answer is still an orthonormal (IE rotation) matrix.
    """
-    s_r = vnormalize(vcross(p_r,t_r))
-    u_r = vnormalize(vcross(p_r,s_r))
-    R=np.hstack((vnormalize(p_r),s_r,u_r))
-    s_b = vnormalize(vcross(p_b,t_b))
-    u_b = vnormalize(vcross(p_b,s_b))
-    B=np.hstack((vnormalize(p_b), s_b, u_b))
-    M_rb=np.identity(4)
-    M_rb[0:3,0:3]=R @ B.T
-    return M_rb
+    p_b=np.asarray(p_b,dtype=np.float64).ravel()[0:3]
+    p_r=np.asarray(p_r,dtype=np.float64).ravel()[0:3]
+    t_b=np.asarray(t_b,dtype=np.float64).ravel()[0:3]
+    t_r=np.asarray(t_r,dtype=np.float64).ravel()[0:3]
+    # Scenes often build many point-towards from the same handful of
+    # constraint vectors (every solar panel on a spacecraft aimed at the
+    # same Sun, say), so the solutions are memoized across instances, keyed
+    # on the input bytes. The cached array is shared and read-only; copy it
+    # so the caller gets the writable matrix this function always returned.
+    result=_pointTowardCached(p_b.tobytes(),p_r.tobytes(),
+                              t_b.tobytes(),t_r.tobytes())
+    return np.array(result,dtype=MATRIX_DTYPE)
+
+
+@functools.lru_cache(maxsize=4096)
+def _pointTowardCached(p_b:bytes,p_r:bytes,t_b:bytes,t_r:bytes)->np.array:
+    """
+    Memoized core of calcPointToward(), keyed on the bytes of the four
+    (already float64, already 3-element) constraint vectors. bytes keys are
+    hashable where arrays are not, and comparing them is a memcmp.
+
+    :return: 4x4 float64 point-toward matrix, read-only because it is shared
+      between every caller that presents the same inputs
+    """
+    p_b=np.frombuffer(p_b)
+    p_r=np.frombuffer(p_r)
+    t_b=np.frombuffer(t_b)
+    t_r=np.frombuffer(t_r)
+    # The whole solution -- crosses, normalizations, and R @ B^T -- runs in
+    # one compiled kernel, since at 3-vector size the dispatch overhead of
+    # doing it through numpy calls dominates the arithmetic
+    result=point_toward(p_b[0],p_b[1],p_b[2],p_r[0],p_r[1],p_r[2],
+                        t_b[0],t_b[1],t_b[2],t_r[0],t_r[1],t_r[2])
+    result.setflags(write=False)
+    return result
 
 
 class PointToward(Transformation):
@@ -298,8 +568,10 @@ class PointToward(Transformation):
         self.p_r=Lp_r
         self.t_b=Lt_b
         self.t_r=Lt_r
-    def matrix(self):
+    def _calcMatrix(self):
         return calcPointToward(self.p_b, self.p_r, self.t_b, self.t_r)
+    def isRigid(self)->bool:
+        return True
 
 
 def calcLocationLookat(location,look_at,p_b=None,t_b=None,t_r=None):
@@ -320,7 +592,72 @@ def calcLocationLookat(location,look_at,p_b=None,t_b=None,t_r=None):
     if t_r is None:
         t_r=Direction( 0.0, 0.0,-1.0)
     result=calcPointToward(p_b=p_b,p_r=look_at-location,t_b=t_b,t_r=t_r) #Use point-toward to point in target direction
-    result=Translation(location).matrix() @ result; #Translate to location
+    # Translate to location. Multiplying by a translation matrix on the left
+    # would only copy the translation into the last column -- since the
+    # point-toward result has no translation of its own, just write the
+    # column directly instead of paying for a 4x4 matmul.
+    result[0:3,3]=np.asarray(location).ravel()[0:3]
+    return result
+
+
+def _normalizeRows(v:np.array)->np.array:
+    """
+    Normalize each row of an (N,3) array of vectors.
+
+    :param v: (N,3) array of vectors
+    :return: (N,3) array of unit vectors
+    """
+    return v/np.linalg.norm(v,axis=-1,keepdims=True)
+
+
+def calcLocationLookatBatch(locations,look_ats,p_b=None,t_b=None,t_r=None):
+    """
+    Create the matrices for a whole sequence of location-look_at
+    transformations at once -- an animated camera path, say, with one
+    location and look-at point per frame.
+
+    Calling calcLocationLookat() per frame re-dispatches a dozen numpy
+    operations on 3-vectors each time; here every step is vectorized over
+    the batch (np.cross and the row normalizations work on (N,3) arrays,
+    and the final R @ B^T is one batched einsum), so the Python overhead is
+    paid once for the whole path.
+
+    :param locations: (N,3) array of locations, one per frame
+    :param look_ats: (N,3) array of look-at points, one per frame
+    :param p_b: body point direction, default is +z (POV-ray camera direction)
+    :param t_b: body toward direction, default is +y (camera down)
+    :param t_r: world toward direction, default is -z (camera ground)
+    :return: (N,4,4) array of transformation matrices, one per frame
+    """
+    if p_b is None:
+        p_b=Direction( 0.0, 0.0, 1.0)
+    if t_b is None:
+        t_b=Direction( 0.0, 1.0, 0.0)
+    if t_r is None:
+        t_r=Direction( 0.0, 0.0,-1.0)
+    locations=np.asarray(locations,dtype=np.float64).reshape(-1,3)
+    look_ats=np.asarray(look_ats,dtype=np.float64).reshape(-1,3)
+    # Reference basis varies per frame: p_r rows, then s_r and u_r from
+    # vectorized crosses
+    p_r=look_ats-locations
+    t_r3=np.asarray(t_r,dtype=np.float64).ravel()[0:3]
+    s_r=_normalizeRows(np.cross(p_r,t_r3))
+    u_r=_normalizeRows(np.cross(p_r,s_r))
+    R=np.stack([_normalizeRows(p_r),s_r,u_r],axis=-1)
+    # Body basis is the same for every frame
+    p_b3=np.asarray(p_b,dtype=np.float64).ravel()[0:3]
+    t_b3=np.asarray(t_b,dtype=np.float64).ravel()[0:3]
+    s_b=np.cross(p_b3,t_b3)
+    s_b/=np.linalg.norm(s_b)
+    u_b=np.cross(p_b3,s_b)
+    u_b/=np.linalg.norm(u_b)
+    B=np.stack([p_b3/np.linalg.norm(p_b3),s_b,u_b],axis=-1)
+    result=np.zeros((locations.shape[0],4,4),dtype=MATRIX_DTYPE)
+    # Batched R @ B^T -- einsum with optimize=True lowers this to one
+    # batched matmul instead of N small ones
+    result[:,0:3,0:3]=np.einsum('nij,kj->nik',R,B,optimize=True)
+    result[:,0:3,3]=locations
+    result[:,3,3]=1.0
     return result
 
 
@@ -356,5 +693,7 @@ class LocationLookat(Transformation):
         self.p_b=Lp_b if Lp_b is not None else Direction( 0, 0, 1)
         self.t_b=Lt_b if Lt_b is not None else Direction( 0, 1, 0)
         self.t_r=Lt_r if Lt_r is not None else Direction( 0, 0,-1)
-    def matrix(self):
+    def _calcMatrix(self):
         return calcLocationLookat(self.location,self.look_at,self.p_b,self.t_b,self.t_r)
+    def isRigid(self)->bool:
+        return True
@@ -0,0 +1,48 @@
+import numpy as np
+
+from kwantrace.field import ColorField, ConstantColor, ObjectColor
+from kwantrace.position_direction import Position
+from kwantrace.transformation import Translation
+
+
+class _PositionField(ColorField):
+    """
+    Test field whose value *is* the local position -- makes it observable
+    which frame a point was evaluated in.
+    """
+    def _fieldLocal(self,r):
+        return r
+
+
+def test_transformed_field_batch():
+    """
+    Exercise Field._evalWorld with a non-identity transform, for a single
+    (4,1) column and for a batch of (N,3) rows as the shading path hands out.
+
+    :return: None, but raises an exception if the test fails
+    """
+    field=_PositionField()
+    field.append(Translation(Lx=1,Ly=0,Lz=0))
+    field.prepareRender()
+    # Single column: world x=4 is field-local x=3
+    assert np.allclose(field(Position(4,0,0))[0:3,:],Position(3,0,0)[0:3,:],atol=1e-6)
+    batch=np.array([[4.0,0,0],[1,2,3]],dtype=np.float32)
+    assert np.allclose(field(batch),[[3,0,0],[0,2,3]],atol=1e-6)
+
+
+def test_constant_color():
+    """
+    Exercise ConstantColor for a single point and for a batch of points.
+
+    :return: None, but raises an exception if the test fails
+    """
+    color=ObjectColor(0.25,0.5,0.75)
+    pigment=ConstantColor(color)
+    pigment.prepareRender()
+    assert np.allclose(pigment(Position(1,2,3)),color)
+    # A batch of world points, (N,3) rows as in RayBatch -- the result is a
+    # broadcast view with one row per point
+    batch=np.zeros((7,3),dtype=np.float32)
+    result=pigment(None,rLocal=batch)
+    assert result.shape==(7,5)
+    assert np.allclose(result,color)
@@ -0,0 +1,93 @@
+import numpy as np
+
+from kwantrace.position_direction import Position, Direction
+from kwantrace.ray import Ray, RayBatch
+
+
+def test_raybatch_transform():
+    """
+    Exercise RayBatch.__rmatmul__().
+
+    :return: None, but raises an exception if the test fails
+
+    Transform a batch of rays with a matrix that both rotates and translates,
+    and check that each ray in the batch matches the equivalent scalar Ray
+    transformed through the homogeneous-coordinate path -- positions pick up
+    the translation, directions do not.
+    """
+    M=np.identity(4)
+    M[0:3,0:3]=np.array([[0,-1,0],
+                         [1, 0,0],
+                         [0, 0,1]]) # rotate +90deg around z
+    M[0:3,3]=np.array([1,2,3])
+    rng=np.random.default_rng(3217)
+    r0=rng.uniform(-10,10,size=(16,3))
+    v=rng.uniform(-1,1,size=(16,3))
+    rays=RayBatch(r0,v)
+    raysp=M @ rays
+    for i in range(len(rays)):
+        ray=Ray(Position(*r0[i,:]),Direction(*v[i,:]))
+        rayp=M @ ray
+        assert np.allclose(raysp.r0[i,:],rayp.r0[0:3].ravel(),atol=1e-5)
+        assert np.allclose(raysp.v [i,:],rayp.v [0:3].ravel(),atol=1e-5)
+
+
+def test_raybatch_eval_advance():
+    """
+    Exercise RayBatch.__call__() and RayBatch.__add__().
+
+    :return: None, but raises an exception if the test fails
+    """
+    rng=np.random.default_rng(3217)
+    rays=RayBatch(rng.uniform(-10,10,size=(8,3)),rng.uniform(-1,1,size=(8,3)))
+    t=rng.uniform(0,10,size=8)
+    assert np.allclose(rays(t),rays.r0+rays.v*t.reshape(-1,1),atol=1e-5)
+    raysp=rays+4.7
+    assert np.allclose(raysp(t),rays(t+4.7),atol=1e-4)
+    raysp=4.7+rays
+    assert np.allclose(raysp(t),rays(t+4.7),atol=1e-4)
+
+
+def test_eval_into():
+    """
+    Exercise the pre-allocated-buffer variants Ray.evalInto(), Ray.advanceInto(),
+    and RayBatch.evalInto() -- they must match the allocating versions and must
+    actually write into the supplied buffers.
+
+    :return: None, but raises an exception if the test fails
+    """
+    ray=Ray(Position(1,2,3),Direction(4,5,6))
+    out=np.empty_like(ray.r0)
+    assert ray.evalInto(2.0,out) is out
+    assert np.allclose(out,ray(2.0))
+    scratch=Ray(np.empty_like(ray.r0),np.empty_like(ray.v))
+    assert ray.advanceInto(4.7,scratch) is scratch
+    assert np.allclose(scratch(2.0),ray(2.0+4.7))
+    rng=np.random.default_rng(3217)
+    rays=RayBatch(rng.uniform(-10,10,size=(8,3)),rng.uniform(-1,1,size=(8,3)))
+    t=rng.uniform(0,10,size=8)
+    outb=np.empty_like(rays.r0)
+    assert rays.evalInto(t,outb) is outb
+    assert np.allclose(outb,rays(t))
+
+
+def test_ray_operators():
+    """
+    Exercise the scalar Ray operators, which run through the compiled kernels.
+
+    :return: None, but raises an exception if the test fails
+    """
+    ray=Ray(Position(1,2,3),Direction(4,5,6))
+    assert np.allclose(ray(2.0),Position(9,12,15))
+    rayp=ray+4.7
+    assert np.allclose(rayp(2.0),ray(2.0+4.7))
+    rayp=4.7+ray
+    assert np.allclose(rayp(2.0),ray(2.0+4.7))
+    rayp=Ray(ray.r0.copy(),ray.v.copy())
+    rayp+=4.7
+    assert np.allclose(rayp(2.0),ray(2.0+4.7))
+    M=np.identity(4)
+    M[0:3,3]=np.array([1,2,3])
+    rayp=M @ ray
+    assert np.allclose(rayp.r0,Position(2,4,6)) # position picks up the translation...
+    assert np.allclose(rayp.v,Direction(4,5,6)) # ...but direction does not
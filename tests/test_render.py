@@ -0,0 +1,53 @@
+import numpy as np
+
+from kwantrace.field import ConstantColor, ObjectColor
+from kwantrace.ray import RayBatch
+from kwantrace.render import renderFrame
+from kwantrace.renderable import Composite
+from kwantrace.sphere import Sphere
+from kwantrace.transformation import Translation
+
+
+def make_scene():
+    scene=Composite()
+    red=Sphere()
+    red.append(Translation(Lx=5.0,Ly=0.0,Lz=0.0))
+    red.setPigment(ConstantColor(ObjectColor(1,0,0)))
+    scene.addChild(red)
+    green=Sphere()
+    green.append(Translation(Lx=0.0,Ly=5.0,Lz=0.0))
+    scene.addChild(green)
+    # green has no pigment of its own, so it inherits the composite's default
+    scene.setPigment(ConstantColor(ObjectColor(0,1,0)))
+    scene.prepareRender()
+    return scene
+
+
+def test_render_frame():
+    """
+    Exercise renderFrame() -- three rays from the origin: one sees the red
+    sphere, one sees the green sphere through the pigment fallback, one sees
+    nothing.
+
+    :return: None, but raises an exception if the test fails
+    """
+    rays=RayBatch(np.zeros((3,3)),
+                  np.array([[1.0,0,0],[0,1,0],[0,0,1]]))
+    out=renderFrame(make_scene(),rays)
+    assert np.allclose(out[0,:],ObjectColor(1,0,0))
+    assert np.allclose(out[1,:],ObjectColor(0,1,0))
+    assert np.allclose(out[2,:],np.zeros(5))
+
+
+def test_render_frame_threaded():
+    """
+    The threaded tile dispatch must produce the identical frame.
+
+    :return: None, but raises an exception if the test fails
+    """
+    scene=make_scene()
+    rng=np.random.default_rng(3217)
+    rays=RayBatch(rng.uniform(-1,1,size=(500,3)),rng.uniform(-1,1,size=(500,3)))
+    serial=renderFrame(scene,rays,tile=64)
+    threaded=renderFrame(scene,rays,tile=64,nthreads=4)
+    assert np.array_equal(serial,threaded)
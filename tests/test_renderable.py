@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from kwantrace.field import ColorField
+from kwantrace.position_direction import Position
+from kwantrace.ray import RayBatch
+from kwantrace.renderable import Composite
+from kwantrace.sphere import Sphere
+from kwantrace.transformation import Translation
+
+
+def make_sphere(x=0.0,y=0.0,z=0.0):
+    sphere=Sphere()
+    if x!=0.0 or y!=0.0 or z!=0.0:
+        sphere.append(Translation(Lx=x,Ly=y,Lz=z))
+    sphere.prepareRender()
+    return sphere
+
+
+def test_primitive_intersect():
+    """
+    Exercise Primitive.intersect() on a batch of rays against a translated sphere.
+
+    :return: None, but raises an exception if the test fails
+    """
+    sphere=make_sphere(x=5.0)
+    # One ray aimed straight at the sphere center, one aimed well away from it
+    rays=RayBatch(np.array([[0.0,0,0],[0,0,0]]),
+                  np.array([[1.0,0,0],[0,1,0]]))
+    hit,t=sphere.intersect(rays)
+    assert hit[0] and not hit[1]
+    assert np.isclose(t[0],4.0,atol=1e-5)
+
+
+def test_primitive_normal_inside():
+    """
+    Exercise Primitive.normal() and Primitive.inside() in world space.
+
+    :return: None, but raises an exception if the test fails
+    """
+    sphere=make_sphere(x=5.0)
+    n=sphere.normal(Position(4.0,0,0))
+    assert np.allclose(n[0:3,0],[-1,0,0],atol=1e-5)
+    assert n[3,0]==0.0
+    assert sphere.inside(Position(5.0,0.5,0))
+    assert not sphere.inside(Position(0.0,0,0))
+    # inside_out inverts both the normal and insideness (any change to the
+    # object requires another prepareRender before rendering)
+    sphere.inside_out=True
+    sphere.prepareRender()
+    n=sphere.normal(Position(4.0,0,0))
+    assert np.allclose(n[0:3,0],[1,0,0],atol=1e-5)
+    assert not sphere.inside(Position(5.0,0.5,0))
+
+
+class _PositionField(ColorField):
+    """
+    Test field whose value *is* the local position -- makes it observable
+    which frame a point was evaluated in.
+    """
+    def _fieldLocal(self,r):
+        return r
+
+
+def test_pigment_own_frame():
+    """
+    Exercise evalPigment frame handling: the primitive's local point may only
+    be reused as the pigment's when their transform chains agree.
+
+    :return: None, but raises an exception if the test fails
+    """
+    # Pigment with a transform of its own, then the sphere's appended on top:
+    # pigment-local space is not primitive-local space
+    sphere=Sphere()
+    pigment=_PositionField()
+    pigment.append(Translation(Lx=1,Ly=0,Lz=0))
+    sphere.setPigment(pigment)
+    sphere.append(Translation(Lx=5,Ly=0,Lz=0))
+    sphere.prepareRender()
+    r=Position(4.0,0,0)               # on the sphere, world frame
+    rLocal=sphere._localPoint(r)      # primitive-local x=-1
+    assert not sphere._pigment_local_ok
+    # Pigment chain is T(1) then T(5), so pigment-local of world x=4 is -2
+    assert np.allclose(sphere.evalPigment(r,rLocal)[0:3,:],
+                       Position(-2.0,0,0)[0:3,:],atol=1e-6)
+    # Same chains: the local point is reused, and gives the same answer the
+    # pigment's own transform would
+    sphere2=Sphere()
+    sphere2.setPigment(_PositionField())
+    sphere2.append(Translation(Lx=5,Ly=0,Lz=0))
+    sphere2.prepareRender()
+    assert sphere2._pigment_local_ok
+    assert np.allclose(sphere2.evalPigment(r,sphere2._localPoint(r))[0:3,:],
+                       Position(-1.0,0,0)[0:3,:],atol=1e-6)
+
+
+# The two cases straddle Composite._SOA_MAX: 25 spheres takes the
+# struct-of-arrays family fast path, 80 overflows it and goes through the
+# BVH packet traversal, so both trace() paths are exercised.
+@pytest.mark.parametrize("n_spheres",[25,80])
+def test_composite_trace(n_spheres):
+    """
+    Exercise Composite.trace() -- it must return the nearest primitive per
+    ray, the same answer a brute-force scan over the children would give.
+
+    :return: None, but raises an exception if the test fails
+    """
+    scene=Composite()
+    spheres=[]
+    rng=np.random.default_rng(3217)
+    centers=rng.uniform(-20,20,size=(n_spheres,3))
+    for center in centers:
+        sphere=Sphere()
+        sphere.append(Translation(Lamount=center))
+        scene.addChild(sphere)
+        spheres.append(sphere)
+    scene.prepareRender()
+    if n_spheres>64:
+        # Guard the path split: this case must actually overflow the SoA
+        # fast path, or the BVH would silently go back to being untested
+        assert len(scene._bounded)>scene._SOA_MAX
+    # Aim each ray from a random origin at a sphere center, cycling through
+    # the spheres, so every ray is guaranteed to hit something
+    N=100
+    r0=rng.uniform(-25,25,size=(N,3))
+    v=centers[np.arange(N)%n_spheres,:]-r0
+    v/=np.linalg.norm(v,axis=1,keepdims=True)
+    rays=RayBatch(r0,v)
+    prims,t=scene.trace(rays)
+    # Brute force the same thing, one sphere at a time. The winner is
+    # recorded element by element -- masked assignment of a sequence-like
+    # Renderable would scatter its members instead (see _asObjectScalar).
+    t_ref=np.full(N,np.inf,dtype=np.float32)
+    prim_ref=np.full(N,None,dtype=object)
+    for sphere in spheres:
+        hit,ts=sphere.intersect(rays)
+        better=hit & (ts<t_ref)
+        t_ref[better]=ts[better]
+        for i in np.flatnonzero(better):
+            prim_ref[i]=sphere
+    finite=t_ref<np.inf
+    assert np.count_nonzero(finite)==N
+    assert np.all((t==np.inf)==~finite)
+    assert np.allclose(t[finite],t_ref[finite],atol=1e-4)
+    assert all(p is q for p,q in zip(prims,prim_ref))
@@ -0,0 +1,67 @@
+import numpy as np
+
+from kwantrace.transformable import Transformable, prepareAll
+from kwantrace.transformation import RotateX, Scaling, Translation
+
+
+def _chains():
+    """
+    Build the three chain shapes the matrix paths branch on: no transforms
+    at all, an all-rigid chain (transpose inverse), and a chain with a
+    scaling in it (full affine inverse).
+
+    :return: list of three fresh unprepared Transformables
+    """
+    return [Transformable(),
+            Transformable([Translation(Lx=1,Ly=2,Lz=3),RotateX(30)]),
+            Transformable([RotateX(-45),
+                           Scaling(np.array([2.0,1.0,3.0])),
+                           Translation(Lx=-4,Ly=0,Lz=0)])]
+
+
+def test_prepareAll_matches_prepareRender():
+    """
+    Exercise prepareAll() -- the batched pass must leave every object with
+    the same M_rb, M_br, and N_rb that its own prepareRender() would, with
+    N_rb C-contiguous as every prepareRender path leaves it.
+
+    :return: None, but raises an exception if the test fails
+    """
+    batched=_chains()
+    prepareAll(batched)
+    reference=_chains()
+    for ref in reference:
+        ref.prepareRender()
+    for obj,ref in zip(batched,reference):
+        assert np.allclose(obj.M_rb,ref.M_rb,atol=1e-12)
+        assert np.allclose(obj.M_br,ref.M_br,atol=1e-12)
+        assert np.allclose(obj.N_rb,ref.N_rb,atol=1e-12)
+        assert obj.N_rb.flags['C_CONTIGUOUS']
+
+
+def test_prepareAll_staleness():
+    """
+    Exercise the staleness short-circuit in prepareAll() -- a second pass
+    with nothing changed must leave the prepared matrices untouched, and
+    after one object's parameter changes only that object is re-prepared.
+
+    :return: None, but raises an exception if the test fails
+    """
+    objects=_chains()
+    prepareAll(objects)
+    before=[obj.M_rb for obj in objects]
+    prepareAll(objects)
+    for obj,m in zip(objects,before):
+        # Identity, not equality: an untouched object keeps the very same
+        # matrix object, proving the pass never got as far as rebuilding it
+        assert obj.M_rb is m
+    # Move the rigid chain and re-prepare the scene: only it is redone
+    objects[1][0].amount=np.array([7.0,2,3])
+    prepareAll(objects)
+    assert objects[0].M_rb is before[0]
+    assert objects[2].M_rb is before[2]
+    assert objects[1].M_rb is not before[1]
+    moved=Transformable([Translation(Lx=7,Ly=2,Lz=3),RotateX(30)])
+    moved.prepareRender()
+    assert np.allclose(objects[1].M_rb,moved.M_rb,atol=1e-12)
+    assert np.allclose(objects[1].M_br,moved.M_br,atol=1e-12)
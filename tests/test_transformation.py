@@ -1,112 +1,146 @@
 import numpy as np
-from kwanmath.vector import vnormalize, vcross
+import pytest
 
-from kwantrace.transformation import calcPointToward
+from kwantrace.position_direction import Direction
+from kwantrace.transformation import calcPointToward,TRS,Translation,RotateVector,Scaling, \
+                                      TransformationBatch
 
-def test_calcPointToward():
+
+def _vnormalize(v):
+    """
+    Normalize the vector part of a homogeneous column vector.
+    """
+    result=v.copy()
+    result[0:3,:]/=np.sqrt(np.sum(v[0:3,:]**2))
+    return result
+
+
+def _vcross(a,b):
+    """
+    Cross product of the vector parts of two homogeneous column vectors,
+    returned as a Direction (w=0).
+    """
+    result=np.zeros((4,1))
+    result[0:3,0]=np.cross(a[0:3,0],b[0:3,0])
+    return result
+
+
+@pytest.fixture(scope="module",autouse=True)
+def warm_kernel():
     """
-    /** Exercise pointToward().
+    Run the compiled point-toward kernel once before the parameterized cases,
+    so the first case doesn't also measure JIT/cache-load time.
+    """
+    calcPointToward(Direction(1,0,0),Direction(0,1,0),
+                    Direction(0,0,1),Direction(0,0,1))
+
+
+# First case is the Space Shuttle example worked in the docstring below; the
+# others exercise axis-aligned and skewed configurations.
+@pytest.mark.parametrize("p_b,t_b,p_r,t_r",[
+    (np.array([[np.cos(np.deg2rad(13))],
+               [0],
+               [-np.sin(np.deg2rad(13))],
+               [0]]),
+     np.array([[0],[0],[1],[0]]),
+     np.array([[np.cos(np.deg2rad(30))*np.sin(np.deg2rad(80))],
+               [np.cos(np.deg2rad(30))*np.cos(np.deg2rad(80))],
+               [np.sin(np.deg2rad(30))],
+               [0]]),
+     np.array([[0],[0],[-1],[0]])),
+    (Direction(1,0,0),Direction(0,0,1),
+     Direction(0,1,0),Direction(0,0,1)),
+    (Direction(0,0,1),Direction(0,1,0),
+     _vnormalize(Direction(1,1,1)),Direction(0,0,-1)),
+])
+def test_calcPointToward(p_b,t_b,p_r,t_r):
+    r"""
+    Exercise calcPointToward().
 
     :return: None, but raises an exception if the test fails
 
-     * \image html Space_Shuttle_Coordinate_System.jpg
-     * \f$
-     *    \def\M#1{{[\mathbf{#1}]}}
-     *    \def\MM#1#2{{[\mathbf{#1}{#2}]}}
-     *    \def\T{^\mathsf{T}}
-     *    \def\operatorname#1{{\mbox{#1}}}
-     * \f$
-     *
-     * The space shuttle has a thrust axis 13&deg; below the X axis, so:
-     * \f$\hat{p}_b=\begin{bmatrix}\cos 13^\circ \\ 0 \\ -\sin 13^\circ \end{bmatrix}
-     *   =\begin{bmatrix}0.974370 \\ 0.000000 \\ -0.224951 \end{bmatrix}\f$
-     *
-     * The heads-up vector is \f$\hat{t}_b=\hat{z}_b\f$. At a particular instant,
-     * the guidance command says to point the thrust vector 30&deg; above the horizon
-     * at an azimuth of 80&deg; east of North. We'll take the local topocentric horizon
-     * frame as the reference frame, with \f$\hat{x}_r\f$ in the horizon plane pointing
-     * east, \f$\hat{y}_r\f$ pointing north, and \f$\hat{z}_r\f$ pointing up. In this
-     * frame, the guidance command is:
-     *
-     * \f$\hat{p}_r=\begin{bmatrix}\cos 30^\circ \sin 80^\circ \\
-     *                             \cos 30^\circ \cos 80^\circ \\
-     *                             \sin 30^\circ\end{bmatrix}=\begin{bmatrix}0.852869 \\
-     *                                                                       0.150384 \\
-     *                                                                       0.500000\end{bmatrix}\f$
-     *
-     * The vehicle is also commanded to the heads-down attitude, which means that
-     * \f$\hat{t}_r=-\hat{z}_r\f$. These are all the inputs we need.
-     *
-     * \f$\hat{s}_b=\operatorname{normalize}(\hat{p}_b \times \hat{t}_b)=\begin{bmatrix} 0 \\
-     *                                                                                  -1 \\
-     *                                                                                   0 \end{bmatrix}\f$
-     *
-     * \f$\hat{u}_b=\operatorname{normalize}(\hat{p}_b \times \hat{s}_b)=\begin{bmatrix} -0.224951 \\
-     *                                                                                    0.000000 \\
-     *                                                                                   -0.974370 \end{bmatrix}\f$
-     *\f$\hat{s}_r=\operatorname{normalize}(\hat{p}_r \times \hat{t}_r)=\begin{bmatrix} -0.173648 \\
-     *                                                                                   0.984808 \\
-     *                                                                                   0.000000 \end{bmatrix}\f$
-     *
-     *\f$\hat{u}_r=\operatorname{normalize}(\hat{p}_r \times \hat{s}_r)=\begin{bmatrix} -0.492404 \\
-     *                                                                                  -0.086824 \\
-     *                                                                                  -0.866025 \end{bmatrix}\f$
-     *
-     * \f$\M{R}=\begin{bmatrix}\hat{p}_r && \hat{s}_r\ && \hat{u}_r \end{bmatrix}=\begin{bmatrix}0.852869&&-0.173648&&-0.492404\\
-     *                                                                                   0.150384&& 0.984808&&-0.086824\\
-     *                                                                                   0.500000&& 0.000000&& 0.866025\end{bmatrix}\f$
-     *
-     * \f$\M{B}=\begin{bmatrix}\hat{p}_b && \hat{s}_b\ && \hat{u}_b \end{bmatrix}=\begin{bmatrix}0.974370&& 0.000000&&-0.224951\\
-     *                                                                                           0.000000&&-1.000000&&-0.000000\\
-     *                                                                                          -0.224951&& 0.000000&&-0.974370\end{bmatrix}\f$
-     *\f$\M{M_{br}}=\M{R}\M{B}^{-1}=\begin{bmatrix}0.941776&& 0.173648&& 0.287930\\
-     *                                             0.166061&&-0.984808&& 0.050770\\
-     *                                             0.292372&& 0.000000&&-0.956305\end{bmatrix}\f$
-     *
-     * There is the solution, but does it work?
-     *
-     * \f$\begin{eqnarray*}\M{M_{br}}\hat{p}_b&=&\begin{bmatrix} 0.852869\\ 0.150384\\ 0.500000\end{bmatrix}&=&\hat{p}_r \\
-     *                     \M{M_{br}}\hat{s}_b&=&\begin{bmatrix}-0.173648\\ 0.984808\\ 0.000000\end{bmatrix}&=&\hat{s}_r \\
-     *                     \M{M_{br}}\hat{u}_b&=&\begin{bmatrix}-0.492404\\-0.086824\\ 0.866025\end{bmatrix}&=&\hat{u}_r \\
-     *                     \M{M_{br}}\hat{t}_b&=&\begin{bmatrix} 0.287930\\ 0.050770\\-0.956305\end{bmatrix}, \operatorname{vangle}(\M{M_{br}}\hat{t}_b,\hat{t}_r)=17^\circ\end{eqnarray*}\f$
-     *
-     * That's a decisive yes.
-     */
+     \image html Space_Shuttle_Coordinate_System.jpg
+     \f$
+        \def\M#1{{[\mathbf{#1}]}}
+        \def\MM#1#2{{[\mathbf{#1}{#2}]}}
+        \def\T{^\mathsf{T}}
+        \def\operatorname#1{{\mbox{#1}}}
+     \f$
+
+     The space shuttle has a thrust axis 13&deg; below the X axis, so:
+     \f$\hat{p}_b=\begin{bmatrix}\cos 13^\circ \\ 0 \\ -\sin 13^\circ \end{bmatrix}
+       =\begin{bmatrix}0.974370 \\ 0.000000 \\ -0.224951 \end{bmatrix}\f$
+
+     The heads-up vector is \f$\hat{t}_b=\hat{z}_b\f$. At a particular instant,
+     the guidance command says to point the thrust vector 30&deg; above the horizon
+     at an azimuth of 80&deg; east of North. We'll take the local topocentric horizon
+     frame as the reference frame, with \f$\hat{x}_r\f$ in the horizon plane pointing
+     east, \f$\hat{y}_r\f$ pointing north, and \f$\hat{z}_r\f$ pointing up. In this
+     frame, the guidance command is:
 
+     \f$\hat{p}_r=\begin{bmatrix}\cos 30^\circ \sin 80^\circ \\
+                                 \cos 30^\circ \cos 80^\circ \\
+                                 \sin 30^\circ\end{bmatrix}=\begin{bmatrix}0.852869 \\
+                                                                           0.150384 \\
+                                                                           0.500000\end{bmatrix}\f$
+
+     The vehicle is also commanded to the heads-down attitude, which means that
+     \f$\hat{t}_r=-\hat{z}_r\f$. These are all the inputs we need. The expected
+     matrix is built right here in the test the long way -- basis vectors from
+     normalized crosses, stacked into \f$\M{R}\f$ and \f$\M{B}\f$, and composed
+     with \f$\M{R}\M{B}\T\f$ -- and the kernel's answer must match it, as well
+     as satisfying the point and plane constraints exactly.
     """
-    p_b=np.array([[np.cos(np.deg2rad(13))]
-                  [0],
-                  [-np.sin(np.deg2rad(13))],
-                  [0]])
-    print(f"{p_b=}")
-    t_b=np.array([[0],[0],[1],[0]])
-    print(f"{t_b=}")
-    p_r=np.array([[np.cos(np.deg2rad(30))*np.sin(np.deg2rad(80))],
-                  [np.cos(np.deg2rad(30))*np.cos(np.deg2rad(80))],
-                  [np.sin(np.deg2rad(30))],
-                  [0]])
-    print(f"{p_r=}")
-    t_r=np.array([[0],[0],[-1],[0]])
-    s_b=vnormalize(vcross(p_b,t_b))
-    print(f"{s_b=}")
-    u_b=vnormalize(vcross(p_b,s_b))
-    print(f"{u_b=}")
-    s_r=vnormalize(vcross(p_r,t_r))
-    print(f"{s_r=}")
-    u_r=vnormalize(vcross(p_r,s_r))
-    print(f"{u_r=}")
-    R=np.hstack((p_r,s_r,u_r))
-    print(f"{R=}")
-    B=np.hstack((p_b,s_b,u_b))
-    print(f"{B=}")
-    M_rb_direct=R*B.T
-    print(f"{M_rb_direct=}")
+    s_b=_vnormalize(_vcross(p_b,t_b))
+    u_b=_vnormalize(_vcross(p_b,s_b))
+    s_r=_vnormalize(_vcross(p_r,t_r))
+    u_r=_vnormalize(_vcross(p_r,s_r))
+    R=np.hstack((_vnormalize(p_r),s_r,u_r))
+    B=np.hstack((_vnormalize(p_b),s_b,u_b))
+    M_rb_direct=np.identity(4)
+    M_rb_direct[0:3,0:3]=R[0:3,:] @ B[0:3,:].T
     M_rb=calcPointToward(p_b,p_r,t_b,t_r)
-    print(f"{M_rb=}")
-    print(f"M_rb@p_b (should equal p_r) {M_rb@p_b} ")
-    assert np.allclose(M_rb@p_b,p_r)
-    print(f"M_rb@s_b (should equal s_r) {M_rb@s_b} ")
+    assert np.allclose(M_rb,M_rb_direct)
+    assert np.allclose(M_rb@_vnormalize(p_b),_vnormalize(p_r))
     assert np.allclose(M_rb@s_b,s_r)
-    print(f"M_rb@u_b (should equal u_r) {M_rb@u_b} ")
     assert np.allclose(M_rb@u_b,u_r)
-    print(f"M_rb@t_b (should be towards t_r) {M_rb@t_b} ")
+
+
+def test_TRS():
+    """
+    TRS must match the explicit Translation @ RotateVector @ Scaling chain.
+
+    :return: None, but raises an exception if the test fails
+    """
+    translate=np.array([3.0,-1.0,2.5])
+    rotate=np.array([20.0,-35.0,110.0])
+    scale=np.array([2.0,0.5,3.0])
+    chained=Translation(translate).matrix() \
+          @ RotateVector(rotate).matrix() \
+          @ Scaling(scale.reshape(3,1)).matrix()
+    assert np.allclose(TRS(translate,rotate,scale).matrix(),chained)
+    # Uniform scalar scale and omitted parts default sensibly
+    assert np.allclose(TRS(Lscale=2.0).matrix(),Scaling(np.full((3,1),2.0)).matrix())
+    assert np.allclose(TRS().matrix(),np.identity(4))
+
+
+def test_TransformationBatch():
+    """
+    The batched kernel must match TRS row for row, and must fill a
+    caller-supplied buffer in place.
+
+    :return: None, but raises an exception if the test fails
+    """
+    rng=np.random.default_rng(3217)
+    N=17
+    translate=rng.uniform(-10,10,(N,3))
+    rotate=rng.uniform(-180,180,(N,3))
+    scale=rng.uniform(0.1,3,(N,3))
+    scale[5,:]=0.0   # zero scale rows turn into 1, as in Scaling
+    batch=TransformationBatch(translate,rotate,scale)
+    matrices=batch.computeMatrices()
+    for i in range(N):
+        assert np.allclose(matrices[i],TRS(translate[i],rotate[i],scale[i]).matrix())
+    out=np.empty((N,4,4))
+    assert batch.computeMatrices(out) is out
+    assert np.allclose(out,matrices)